@@ -0,0 +1,273 @@
+"""
+Benchmark suite for invitation card rendering
+Measures throughput, per-card latency, peak memory and bytes written
+
+Usage:
+    python bench.py run --output results.json           # full matrix
+    python bench.py run --quick --output results.json   # 10 and 100 cards only
+    python bench.py run --quick --sizes A5 --encoders png png-fast png-palette webp jpeg
+    python bench.py compare baseline.json results.json --threshold 0.10
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIGS = sorted(glob.glob(os.path.join(BENCH_DIR, 'examples', '*_config.py')))
+DEFAULT_COUNTS = [10, 100, 1000, 10000]
+QUICK_COUNTS = [10, 100]
+DEFAULT_ENCODERS = ['png']
+
+# Metrics checked by `compare`: name -> True if higher is better
+COMPARED_METRICS = {
+    'cards_per_sec': True,
+    'latency_ms.p95': False,
+    'peak_rss_mb': False,
+    'bytes_per_card': False,
+    'phases.encode.mean_ms': False,
+}
+
+
+def load_config_module(path):
+    """Import a config file (config.py or examples/*_config.py) by path"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def participant_names(count):
+    """Synthetic guest names of varying length"""
+    first = ['Ann', 'Mohammed', 'Li', 'Gabriela', 'Jonathan', 'Zoë', 'Siddharth', 'Eve']
+    last = ['Smith', 'Al-Farsi', 'Wang', 'Fernández', 'Okonkwo-Adeyemi', 'Nguyen', 'Ivanova']
+    return [f"{first[i % len(first)]} {last[i % len(last)]} {i:05d}" for i in range(count)]
+
+
+def run_case(config_path, paper_size, count, encoder_name='png'):
+    """
+    Render `count` cards for one config at one paper size and encoder
+    
+    Returns:
+        Dictionary of metrics for this case
+    """
+    # Imported here so `compare` works without Pillow installed
+    from invite import InvitationCardGenerator, FONT_REGISTRY
+    from outputs import ENCODER_PRESETS
+    from timing import RenderStats, percentile
+    
+    config = load_config_module(config_path).EVENT_CONFIG
+    names = participant_names(count)
+    encoder = ENCODER_PRESETS[encoder_name]
+    stats = RenderStats()
+    latencies = []
+    bytes_written = 0
+    
+    with tempfile.TemporaryDirectory(prefix='invite_bench_') as output_folder:
+        generator = InvitationCardGenerator(paper_size, timer=stats)
+        started = time.perf_counter()
+        for name in names:
+            card_started = time.perf_counter()
+            filepath = generator.generate_card(config, name, output_folder, encoder=encoder)
+            latencies.append((time.perf_counter() - card_started) * 1000)
+            bytes_written += os.path.getsize(filepath)
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'config': os.path.splitext(os.path.basename(config_path))[0],
+        'paper_size': paper_size,
+        'count': count,
+        'encoder': encoder_name,
+        'card_size': [generator.width, generator.height],
+        'elapsed_sec': elapsed,
+        'cards_per_sec': count / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 0.50),
+            'p90': percentile(latencies, 0.90),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1],
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'bytes_written': bytes_written,
+        'bytes_per_card': bytes_written / count,
+        'phases': stats.summary(),
+        'default_font': bool(FONT_REGISTRY.using_default_font()),
+    }
+
+
+def run_suite(configs, paper_sizes, counts, encoders=DEFAULT_ENCODERS):
+    """
+    Run every (config, paper size, count, encoder) case in a fresh interpreter
+    
+    Each case gets its own process so peak RSS belongs to that case alone.
+    """
+    from invite import RENDERER_VERSION
+    
+    results = []
+    for config_path in configs:
+        for paper_size in paper_sizes:
+            for count in counts:
+                for encoder_name in encoders:
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), 'case',
+                         config_path, paper_size, str(count), '--encoder', encoder_name],
+                        check=True, capture_output=True, text=True, cwd=BENCH_DIR
+                    ).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    results.append(result)
+                    encode_ms = result['phases'].get('encode', {}).get('mean_ms', 0)
+                    print(f"{result['config']:<24} {paper_size:<9} {count:>6} cards  "
+                          f"{encoder_name:<13} {result['cards_per_sec']:8.1f} cards/s  "
+                          f"p95 {result['latency_ms']['p95']:7.1f} ms  "
+                          f"encode {encode_ms:7.1f} ms  "
+                          f"RSS {result['peak_rss_mb'] or 0:7.1f} MB  "
+                          f"{result['bytes_per_card'] / 1024:7.1f} KB/card", file=sys.stderr)
+    
+    try:
+        import PIL
+        pillow_version = PIL.__version__
+    except ImportError:
+        pillow_version = None
+    
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pillow': pillow_version,
+            'platform': platform.platform(),
+            'renderer_version': RENDERER_VERSION,
+        },
+        'results': results,
+    }
+
+
+def _metric(result, name):
+    """Look up a possibly nested metric such as 'latency_ms.p95'"""
+    value = result
+    for part in name.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare_runs(baseline, current, threshold):
+    """
+    Compare two benchmark result files case by case
+    
+    Returns:
+        List of (case, metric, baseline value, current value, relative change)
+        for every metric that got worse by more than threshold
+    """
+    def key(result):
+        return (result['config'], result['paper_size'], result['count'],
+                result.get('encoder', 'png'))
+    
+    baseline_cases = {key(result): result for result in baseline['results']}
+    regressions = []
+    
+    for result in current['results']:
+        base = baseline_cases.get(key(result))
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = _metric(base, metric), _metric(result, metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            print(f"{' / '.join(map(str, key(result))):<46} {metric:<22} "
+                  f"{old:12.2f} → {new:12.2f}  ({change:+.1%})")
+            if worse > threshold:
+                regressions.append((key(result), metric, old, new, change))
+    
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Invitation card rendering benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    run = commands.add_parser('run', help='run the benchmark matrix')
+    run.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                     help='config files to render (default: examples/*_config.py)')
+    run.add_argument('--sizes', nargs='+', default=None,
+                     help='paper sizes (default: every PAPER_WIDTHS preset)')
+    run.add_argument('--counts', nargs='+', type=int, default=None,
+                     help=f'participant counts (default: {DEFAULT_COUNTS})')
+    run.add_argument('--quick', action='store_true', help=f'use counts {QUICK_COUNTS}')
+    run.add_argument('--encoders', nargs='+', default=DEFAULT_ENCODERS,
+                     help='encoder presets from outputs.ENCODER_PRESETS (default: png)')
+    run.add_argument('--output', help='write JSON results to this file (default: stdout)')
+    
+    compare = commands.add_parser('compare', help='compare two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10,
+                         help='allowed relative slowdown before failing (default: 0.10)')
+    
+    case = commands.add_parser('case', help=argparse.SUPPRESS)
+    case.add_argument('config')
+    case.add_argument('paper_size')
+    case.add_argument('count', type=int)
+    case.add_argument('--encoder', default='png')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'case':
+        print(json.dumps(run_case(args.config, args.paper_size, args.count, args.encoder)))
+        return 0
+    
+    if args.command == 'compare':
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+        regressions = compare_runs(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+        return 0
+    
+    from invite import InvitationCardGenerator
+    
+    sizes = args.sizes or list(InvitationCardGenerator.PAPER_WIDTHS)
+    counts = args.counts or (QUICK_COUNTS if args.quick else DEFAULT_COUNTS)
+    report = run_suite(args.configs, sizes, counts, args.encoders)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
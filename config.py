@@ -6,7 +6,8 @@ Edit this file to customize your event invitations
 # ============================================
 # PARTICIPANTS
 # ============================================
-# Add or modify participant names here
+# Add or modify participant names here, or point to a guest list file
+# with a 'name' column, e.g. PARTICIPANTS = "guests.csv" (.csv, .jsonl, .txt)
 PARTICIPANTS = [
     "Part1",
     "Part2",
@@ -75,3 +76,10 @@ PAPER_SIZE = 'A5'
 # OUTPUT SETTINGS
 # ============================================
 OUTPUT_FOLDER = 'output'
+
+# ============================================
+# FONT SETTINGS
+# ============================================
+# Extra folders searched for fonts before the system font folders, e.g. for
+# emoji or non-Latin scripts used in names ('~/fonts', 'assets/fonts')
+FONT_DIRS = []
@@ -0,0 +1,172 @@
+"""
+Card ornaments rasterized once and reused as sprites
+A sprite is a 1-bit mask; its color is applied when it is pasted, so one mask
+serves every color scheme
+"""
+
+from PIL import Image, ImageDraw
+from collections import OrderedDict
+import math
+import threading
+
+
+# Ornament styles a config can list under 'ornaments', in draw order
+ORNAMENT_STYLES = ('background', 'border', 'corners')
+DEFAULT_ORNAMENTS = ('corners',)
+
+
+def hexagon_points(x, y, size):
+    """Corner points of a flat-topped hexagon centered on (x, y)"""
+    points = []
+    for i in range(6):
+        rad = math.radians(i * 60)
+        points.append((x + size * math.cos(rad), y + size * math.sin(rad)))
+    return points
+
+
+def hexagon_extent(size, width):
+    """Distance from a hexagon's center to the edge of its sprite"""
+    return int(math.ceil(size + width)) + 1
+
+
+def honeycomb_geometry(size):
+    """
+    One period of a honeycomb of flat-topped hexagons
+    
+    Returns:
+        (tile width, tile height, hexagon centers) - the tile is 3 × size
+        wide and √3 × size tall (rounded to whole pixels); the centers cover
+        the tile and its neighbours, so outlines crossing the tile edge are
+        complete once tiles are joined
+    """
+    tile_width = int(round(3 * size))
+    tile_height = int(round(math.sqrt(3) * size))
+    centers = [(column * tile_width / 2, row * tile_height + (tile_height / 2 if column % 2 else 0))
+               for column in range(-2, 4) for row in range(-1, 3)]
+    return tile_width, tile_height, centers
+
+
+def edge_positions(width, height, inset, size):
+    """Evenly spaced hexagon centers along the edges of a width × height region"""
+    def spread(length, step):
+        count = max(2, int((length - 2 * inset) // step) + 1)
+        return [int(round(inset + i * (length - 2 * inset) / (count - 1))) for i in range(count)]
+    
+    # Across, flat-topped hexagons are 2 × size wide; down, √3 × size tall
+    xs = spread(width, 2.6 * size)
+    ys = spread(height, 2.4 * size)
+    positions = {(x, y) for x in xs for y in (ys[0], ys[-1])}
+    positions.update((x, y) for x in (xs[0], xs[-1]) for y in ys)
+    return sorted(positions)
+
+
+class SpriteCache:
+    """
+    Alpha masks for ornaments, rasterized once per (style, size, line width)
+    
+    Ornaments are drawn without anti-aliasing, so 1-bit masks lose nothing
+    and paste several times faster than 'L' masks. Single hexagons are
+    pasted at whole-pixel positions, so one mask serves every position.
+    Patterns (a tiled honeycomb background or border strip) are rendered
+    once per region size from a small periodic tile, so a dense pattern
+    costs one paste per card. Pattern masks are card-sized, so max_sprites
+    is kept small.
+    
+    Usage:
+        SPRITES.paste_hexagon(img, x, y, size, width, color)
+        SPRITES.paste_pattern(img, 'background', box, size, width, color)
+    """
+    
+    def __init__(self, max_sprites=16):
+        self.max_sprites = max_sprites
+        self._sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def _get(self, key, build):
+        """LRU lookup, building the sprite on a miss"""
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+        
+        # Built outside the lock: patterns build their tile through _get
+        sprite = build()
+        with self._lock:
+            self.misses += 1
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.max_sprites:
+                self._sprites.popitem(last=False)
+        return sprite
+    
+    def hexagon(self, size, width):
+        """Hexagon outline mask; returns (mask, offset of its center)"""
+        def build():
+            pad = hexagon_extent(size, width)
+            mask = Image.new('1', (2 * pad + 1, 2 * pad + 1), 0)
+            ImageDraw.Draw(mask).polygon(hexagon_points(pad, pad, size), outline=255, width=width)
+            return mask, pad
+        
+        return self._get(('hexagon', size, width), build)
+    
+    def honeycomb_tile(self, size, width):
+        """
+        One period of a honeycomb of hexagon outlines (see honeycomb_geometry)
+        
+        The tile wraps seamlessly in both directions.
+        """
+        def build():
+            tile_width, tile_height, centers = honeycomb_geometry(size)
+            mask = Image.new('1', (tile_width, tile_height), 0)
+            draw = ImageDraw.Draw(mask)
+            for x, y in centers:
+                draw.polygon(hexagon_points(x, y, size), outline=255, width=width)
+            return mask
+        
+        return self._get(('honeycomb', size, width), build)
+    
+    def pattern(self, style, region, size, width):
+        """
+        Mask covering a whole region (width, height) with a pattern style
+        
+        'background' tiles the honeycomb over the region; 'border' puts a
+        chain of whole hexagons along its four edges.
+        """
+        def build():
+            region_width, region_height = region
+            mask = Image.new('1', region, 0)
+            if style == 'border':
+                hexagon, offset = self.hexagon(size, width)
+                for x, y in edge_positions(region_width, region_height, offset, size):
+                    mask.paste(1, (x - offset, y - offset), hexagon)
+            else:
+                tile = self.honeycomb_tile(size, width)
+                for y in range(0, region_height, tile.height):
+                    for x in range(0, region_width, tile.width):
+                        mask.paste(tile, (x, y))
+            return mask
+        
+        return self._get(('pattern', style, tuple(region), size, width), build)
+    
+    def paste_hexagon(self, img, x, y, size, width, color):
+        """Paste a hexagon outline centered on (x, y), snapped to whole pixels"""
+        mask, offset = self.hexagon(size, width)
+        img.paste(color, (int(round(x)) - offset, int(round(y)) - offset), mask)
+    
+    def paste_pattern(self, img, style, box, size, width, color):
+        """Fill box [left, top, right, bottom] with a pattern style"""
+        left, top, right, bottom = box
+        mask = self.pattern(style, (right - left, bottom - top), size, width)
+        img.paste(color, (left, top), mask)
+    
+    def clear(self):
+        """Drop every cached sprite"""
+        with self._lock:
+            self._sprites.clear()
+            self.hits = self.misses = 0
+
+
+SPRITES = SpriteCache()
@@ -0,0 +1,551 @@
+"""
+Font discovery and per-character fallback
+Fonts are found by file name in configurable directories; text is split into
+runs so every character is drawn with the first face that has a glyph for it.
+Loaded fonts and text measurements are cached process-wide
+"""
+
+from PIL import ImageFont
+from bisect import bisect_right
+from collections import OrderedDict
+import os
+import struct
+import threading
+import unicodedata
+import warnings
+
+
+# Searched in order after the directories in INVITE_FONT_DIRS (os.pathsep
+# separated); missing directories are ignored
+FONT_DIRS = (
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    '~/.local/share/fonts',
+    '~/.fonts',
+    '~/Library/Fonts',
+    '/Library/Fonts',
+    '/System/Library/Fonts',
+    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'),
+)
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc')
+
+
+class Coverage:
+    """Set of codepoints a font maps to a glyph, stored as sorted ranges"""
+    
+    __slots__ = ('starts', 'ends')
+    
+    def __init__(self, ranges):
+        self.starts = [start for start, _ in ranges]
+        self.ends = [end for _, end in ranges]
+    
+    def __contains__(self, codepoint):
+        i = bisect_right(self.starts, codepoint) - 1
+        return i >= 0 and codepoint <= self.ends[i]
+    
+    def __len__(self):
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+
+def _merge(codepoints):
+    """Sorted codepoints -> list of inclusive (start, end) ranges"""
+    ranges = []
+    for codepoint in codepoints:
+        if ranges and codepoint == ranges[-1][1] + 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return ranges
+
+
+def _merge_ranges(ranges):
+    """Overlapping or adjacent (start, end) ranges -> sorted, merged ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _read_cmap_format4(f, offset):
+    f.seek(offset + 6)
+    seg_count = struct.unpack('>H', f.read(2))[0] // 2
+    f.seek(offset + 14)
+    ends = struct.unpack(f'>{seg_count}H', f.read(2 * seg_count))
+    f.read(2)  # reserved pad
+    starts = struct.unpack(f'>{seg_count}H', f.read(2 * seg_count))
+    deltas = struct.unpack(f'>{seg_count}h', f.read(2 * seg_count))
+    range_offsets_at = f.tell()
+    range_offsets = struct.unpack(f'>{seg_count}H', f.read(2 * seg_count))
+    
+    codepoints = []
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if start == 0xFFFF:
+            continue
+        if range_offsets[i] == 0:
+            codepoints.extend(c for c in range(start, end + 1) if (c + deltas[i]) & 0xFFFF)
+            continue
+        # Glyph ids come from glyphIdArray, addressed relative to the offset itself
+        f.seek(range_offsets_at + 2 * i + range_offsets[i])
+        glyphs = struct.unpack(f'>{end - start + 1}H', f.read(2 * (end - start + 1)))
+        codepoints.extend(start + j for j, glyph in enumerate(glyphs) if glyph)
+    return _merge(codepoints)
+
+
+def _read_cmap_format12(f, offset):
+    f.seek(offset + 12)
+    group_count = struct.unpack('>L', f.read(4))[0]
+    groups = struct.iter_unpack('>3L', f.read(12 * group_count))
+    return _merge_ranges((start, end) for start, end, _ in groups)
+
+
+def read_coverage(path, index=0):
+    """
+    Codepoints covered by a TrueType / OpenType font, read from its cmap table
+    
+    Args:
+        path: Font file (.ttf, .otf, or a .ttc / .otc collection)
+        index: Font index within a collection
+    
+    Returns:
+        Coverage of the font's best Unicode cmap
+    
+    Raises:
+        ValueError: The file has no usable Unicode cmap
+    """
+    with open(path, 'rb') as f:
+        start = 0
+        if f.read(4) == b'ttcf':
+            f.seek(12 + 4 * index)
+            start = struct.unpack('>L', f.read(4))[0]
+        f.seek(start + 4)
+        table_count = struct.unpack('>H', f.read(2))[0]
+        f.seek(start + 12)
+        tables = {}
+        for tag, _, offset, _ in struct.iter_unpack('>4s3L', f.read(16 * table_count)):
+            tables[tag] = offset
+        if b'cmap' not in tables:
+            raise ValueError(f"No cmap table in {path}")
+        
+        cmap = tables[b'cmap']
+        f.seek(cmap + 2)
+        subtable_count = struct.unpack('>H', f.read(2))[0]
+        records = list(struct.iter_unpack('>2HL', f.read(8 * subtable_count)))
+        subtables = {}
+        for platform, encoding, offset in records:
+            f.seek(cmap + offset)
+            subtables[(platform, encoding)] = (struct.unpack('>H', f.read(2))[0], cmap + offset)
+        
+        # Full-Unicode tables first, then BMP-only ones
+        for key in ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0)):
+            if key not in subtables:
+                continue
+            format, offset = subtables[key]
+            if format in (12, 13):
+                return Coverage(_read_cmap_format12(f, offset))
+            if format == 4:
+                return Coverage(_read_cmap_format4(f, offset))
+    raise ValueError(f"No supported Unicode cmap in {path}")
+
+
+class FontLibrary:
+    """
+    Font files found by name in a list of directories, with their glyph coverage
+    
+    The directory index is built on first use. Coverage is read once per
+    file, and coverage answers are cached per (font file, codepoint).
+    
+    Usage:
+        path = FONT_LIBRARY.find('DejaVuSans.ttf')
+        FONT_LIBRARY.covers(path, ord('é'))
+    """
+    
+    def __init__(self, directories=None):
+        self.directories = list(directories) if directories is not None else default_font_dirs()
+        self._index = None
+        self._coverage = {}
+        self._covers = {}
+        self._lock = threading.Lock()
+    
+    def set_directories(self, directories):
+        """Search these directories instead and forget the index and coverage"""
+        with self._lock:
+            self.directories = list(directories)
+            self._index = None
+            self._coverage.clear()
+            self._covers.clear()
+    
+    def index(self):
+        """Lower-cased file name -> path of every font file in the directories"""
+        with self._lock:
+            if self._index is None:
+                index = {}
+                for directory in self.directories:
+                    for root, dirs, files in os.walk(os.path.expanduser(directory)):
+                        dirs.sort()
+                        for name in sorted(files):
+                            if name.lower().endswith(FONT_EXTENSIONS):
+                                # Earlier directories win
+                                index.setdefault(name.lower(), os.path.join(root, name))
+                self._index = index
+            return self._index
+    
+    def find(self, name):
+        """
+        Path of a font file, or None if it isn't installed
+        
+        name is a file name looked up in the directories, or a path
+        """
+        if os.path.dirname(name):
+            return name if os.path.isfile(name) else None
+        return self.index().get(name.lower())
+    
+    def coverage(self, path):
+        """Coverage of a font file (None if its cmap can't be read)"""
+        coverage = self._coverage.get(path, False)
+        if coverage is False:
+            try:
+                coverage = read_coverage(path)
+            except (OSError, ValueError, struct.error):
+                coverage = None
+            self._coverage[path] = coverage
+        return coverage
+    
+    def covers(self, path, codepoint):
+        """Whether a font file has a glyph for codepoint (True if unknown)"""
+        key = (path, codepoint)
+        covered = self._covers.get(key)
+        if covered is None:
+            coverage = self.coverage(path)
+            covered = self._covers[key] = coverage is None or codepoint in coverage
+        return covered
+
+
+def default_font_dirs():
+    """INVITE_FONT_DIRS (if set) followed by the platform font directories"""
+    extra = os.environ.get('INVITE_FONT_DIRS', '')
+    return [directory for directory in extra.split(os.pathsep) if directory] + list(FONT_DIRS)
+
+
+# Shared by every font registry in this process
+FONT_LIBRARY = FontLibrary()
+
+
+# Characters that never start a new run: they stay with the face of the
+# text around them (spaces between words of one script, combining marks,
+# emoji variation selectors and joiners)
+_KEEP = -1
+_ATTACHED_CATEGORIES = ('Mn', 'Me', 'Cf', 'Zs')
+
+
+class FallbackFont:
+    """
+    A primary face plus fallback faces, used per character
+    
+    Measures like the primary FreeTypeFont (getbbox, getlength, getmetrics)
+    so layout code doesn't need to know about fallback. Text the primary
+    face covers entirely is measured and drawn exactly as with the primary
+    face alone; mixed text is drawn run by run on the primary face's
+    baseline (see draw_text).
+    """
+    
+    def __init__(self, faces, paths, library=None):
+        self.faces = list(faces)
+        self.paths = list(paths)
+        self.primary = self.faces[0]
+        self.size = self.primary.size
+        self.path = '|'.join(self.paths)  # measurement cache key
+        self._library = library or FONT_LIBRARY
+        self._face_of = {}  # character -> face index (or _KEEP)
+    
+    def _pick(self, char):
+        """Index of the first face with a glyph for char"""
+        if unicodedata.category(char) in _ATTACHED_CATEGORIES:
+            index = _KEEP
+        else:
+            codepoint = ord(char)
+            index = next((i for i, path in enumerate(self.paths)
+                          if self._library.covers(path, codepoint)), 0)
+        self._face_of[char] = index
+        return index
+    
+    def runs(self, text):
+        """Split text into (face, text) runs, in order"""
+        face_of = self._face_of
+        runs = []
+        current = start = 0
+        for i, char in enumerate(text):
+            index = face_of.get(char)
+            if index is None:
+                index = self._pick(char)
+            if index == _KEEP or index == current:
+                continue
+            if i > start:
+                runs.append((self.faces[current], text[start:i]))
+            current, start = index, i
+        runs.append((self.faces[current], text[start:]))
+        return runs
+    
+    def getbbox(self, text, *args, **kwargs):
+        """Bounding box of text drawn at (0, 0) with the top-left anchor"""
+        runs = self.runs(text)
+        if len(runs) == 1 and runs[0][0] is self.primary:
+            return self.primary.getbbox(text, *args, **kwargs)
+        
+        ascent = self.primary.getmetrics()[0]
+        x = 0
+        left = top = right = bottom = None
+        for face, run in runs:
+            box = face.getbbox(run, anchor='ls')
+            if left is None:
+                left, top, right, bottom = x + box[0], ascent + box[1], x + box[2], ascent + box[3]
+            else:
+                left, top = min(left, x + box[0]), min(top, ascent + box[1])
+                right, bottom = max(right, x + box[2]), max(bottom, ascent + box[3])
+            x += face.getlength(run)
+        return left, top, right, bottom
+    
+    def getlength(self, text, *args, **kwargs):
+        return sum(face.getlength(run, *args, **kwargs) for face, run in self.runs(text))
+    
+    def getmetrics(self):
+        """(ascent, descent) of the primary face, which sets the line spacing"""
+        return self.primary.getmetrics()
+    
+    def getname(self):
+        return self.primary.getname()
+
+
+def draw_text(draw, xy, text, font, fill):
+    """
+    draw.text for plain fonts and FallbackFonts
+    
+    Runs in fallback faces are drawn on the primary face's baseline, so
+    mixed-script text lines up.
+    """
+    if not isinstance(font, FallbackFont):
+        draw.text(xy, text, font=font, fill=fill)
+        return
+    
+    runs = font.runs(text)
+    if len(runs) == 1 and runs[0][0] is font.primary:
+        draw.text(xy, text, font=font.primary, fill=fill)
+        return
+    
+    x, y = xy
+    baseline = y + font.primary.getmetrics()[0]
+    for face, run in runs:
+        draw.text((x, baseline), run, font=face, fill=fill, anchor='ls')
+        x += face.getlength(run)
+
+
+# ===== SHARED FONT AND MEASUREMENT CACHES =====
+class FontRegistry:
+    """
+    Process-wide cache of loaded fonts, shared by every generator
+    
+    Fonts are keyed by (font files, size) and evicted least-recently-used
+    once more than max_fonts are loaded. Each fallback chain is resolved to
+    its installed files only once; they are kept in `resolved` so a fallback
+    to PIL's default font is visible instead of silent. A chain with more
+    than one installed face loads as a FallbackFont.
+    """
+    
+    def __init__(self, max_fonts=64):
+        self.max_fonts = max_fonts
+        self.resolved = {}  # fallback chain -> installed files (() = PIL default)
+        self.hits = 0
+        self.misses = 0
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _load(self, files, size):
+        faces, paths = [], []
+        for path in files:
+            try:
+                faces.append(ImageFont.truetype(path, size))
+            except OSError:  # e.g. a bitmap-only emoji font at this size
+                continue
+            paths.append(path)
+        if not faces:
+            return ImageFont.load_default()
+        if len(faces) == 1:
+            return faces[0]
+        return FallbackFont(faces, paths)
+    
+    def _resolve(self, paths):
+        """Find the installed files of a fallback chain once"""
+        files = tuple(path for path in map(FONT_LIBRARY.find, paths) if path is not None)
+        if not files:
+            warnings.warn(f"None of the fonts {list(paths)} is installed in "
+                          f"{FONT_LIBRARY.directories}; falling back to PIL's default font")
+        self.resolved[paths] = files
+        return files
+    
+    def get(self, paths, size):
+        """
+        Return the font for a fallback chain at the given size
+        
+        Args:
+            paths: Tuple of font file names or paths, in fallback order
+            size: Font size in pixels
+        """
+        paths = tuple(paths)
+        with self._lock:
+            files = self.resolved.get(paths)
+            if files is None:
+                files = self._resolve(paths)
+            key = (files, size)
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            
+            font = self._load(files, size)
+            self.misses += 1
+            self._fonts[key] = font
+            if len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+            return font
+    
+    def using_default_font(self):
+        """Return the fallback chains that resolved to PIL's default font"""
+        return [paths for paths, files in self.resolved.items() if not files]
+    
+    def clear(self):
+        """Forget all loaded fonts and resolved fallback chains"""
+        with self._lock:
+            self._fonts.clear()
+            self.resolved.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by all InvitationCardGenerator instances in this process
+FONT_REGISTRY = FontRegistry()
+
+
+class TextMetrics:
+    """
+    Memoized text measurements shared by all generators
+    
+    Bounding boxes are cached by (font, text) with LRU eviction, so text that
+    repeats across a batch (title, details, agenda, ...) is measured once.
+    """
+    
+    def __init__(self, max_entries=8192):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._boxes = OrderedDict()
+        self._line_metrics = {}
+        self._advances = {}  # font key -> {character: advance}
+        self._lock = threading.Lock()
+    
+    def _font_key(self, font):
+        path = getattr(font, 'path', None)
+        return (path, font.size) if isinstance(path, str) else id(font)
+    
+    def bbox(self, font, text, cache=True):
+        """Bounding box of text drawn at (0, 0), as ImageDraw.textbbox returns it"""
+        if not cache:
+            return font.getbbox(text)
+        
+        key = (self._font_key(font), text)
+        with self._lock:
+            box = self._boxes.get(key)
+            if box is not None:
+                self._boxes.move_to_end(key)
+                self.hits += 1
+                return box
+        
+        box = font.getbbox(text)
+        with self._lock:
+            self.misses += 1
+            self._boxes[key] = box
+            if len(self._boxes) > self.max_entries:
+                self._boxes.popitem(last=False)
+        return box
+    
+    def width(self, font, text, cache=True):
+        """Width of text in pixels"""
+        box = self.bbox(font, text, cache)
+        return box[2] - box[0]
+    
+    def advance(self, font, text):
+        """
+        Sum of per-character advances: a quick width estimate
+        
+        Ignores kerning and glyph overhang, so it is off by a fraction of
+        the font size at most; advances are cached per character.
+        """
+        key = self._font_key(font)
+        advances = self._advances.get(key)
+        if advances is None:
+            advances = self._advances.setdefault(key, {})
+        total = 0
+        for char in text:
+            width = advances.get(char)
+            if width is None:
+                width = advances[char] = font.getlength(char)
+            total += width
+        return total
+    
+    def line_metrics(self, font):
+        """(ascent, descent) of a font"""
+        key = self._font_key(font)
+        metrics = self._line_metrics.get(key)
+        if metrics is None:
+            metrics = self._line_metrics[key] = font.getmetrics()
+        return metrics
+    
+    def wrap(self, font, text, max_width, cache=True):
+        """
+        Split text into lines no wider than max_width
+        
+        Breaks at spaces; a single word wider than max_width is broken
+        between characters.
+        """
+        # Text well inside the line needs no exact measurement
+        if self.advance(font, text) + font.size <= max_width:
+            return [text]
+        if self.width(font, text, cache) <= max_width:
+            return [text]
+        
+        lines = []
+        current = ''
+        for word in text.split(' '):
+            candidate = f"{current} {word}" if current else word
+            if self.width(font, candidate, cache) <= max_width:
+                current = candidate
+                continue
+            if current:
+                lines.append(current)
+            
+            # Break words longer than a whole line
+            while len(word) > 1 and self.width(font, word, cache) > max_width:
+                cut = len(word) - 1
+                while cut > 1 and self.width(font, word[:cut], cache) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            current = word
+        
+        if current:
+            lines.append(current)
+        return lines
+    
+    def clear(self):
+        """Forget all measurements"""
+        with self._lock:
+            self._boxes.clear()
+            self._line_metrics.clear()
+            self._advances.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by all InvitationCardGenerator instances in this process
+TEXT_METRICS = TextMetrics()
@@ -1,27 +1,306 @@
 """
 Main script to generate invitation cards with auto-fit height
 Run this file to create all invitations
+
+    python generate.py                                   # uses config.py
+    python generate.py examples/wedding_config.py --size A6 --output out
+    python generate.py guests_config --participants guests.csv --workers 0
+    python generate.py --dry-run                         # layout only, nothing written
+    python generate.py --watch                           # re-render on every config save
 """
 
-from invite import generate_all_invitations
-from config import PARTICIPANTS, EVENT_CONFIG, PAPER_SIZE, OUTPUT_FOLDER
+import argparse
+import importlib
+import importlib.util
+import os
+import time
+
+# PIL and the renderer are imported inside the commands, so --help and
+# argument errors don't pay for them
+
+
+def load_config(source):
+    """
+    Import a config module by name ('config', 'examples.wedding_config') or
+    from a .py file path
+    """
+    if source.endswith('.py') or os.sep in source or '/' in source:
+        path = os.path.abspath(source)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Config file not found: {source}")
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return importlib.import_module(source)
+
+
+def paper_size_arg(value):
+    """'A5' -> 'A5', '1500' -> 1500 (custom width in pixels)"""
+    return int(value) if value.isdigit() else value.upper()
+
+
+def shard_arg(value):
+    """'2/8' -> (2, 8): shard 2 (0-based) of 8"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, e.g. 0/4, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..COUNT-1, got {value!r}")
+    return index, count
 
-def main():
-    """Generate invitation cards with auto-fit height based on config.py settings"""
+
+def variant_arg(value):
+    """'email' -> ('email', None, None) (a preset), 'web=1600:webp' -> ('web', 1600, 'webp')"""
+    name, _, spec = value.partition('=')
+    if not spec:
+        return name, None, None
+    width, _, preset = spec.partition(':')
+    if not width.isdigit() or int(width) < 1:
+        raise argparse.ArgumentTypeError(f"expected NAME=WIDTH[:ENCODER], e.g. web=1600:webp, "
+                                         f"got {value!r}")
+    return name, int(width), preset or None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Generate auto-fit invitation cards from a config module')
+    parser.add_argument('config', nargs='?', default='config',
+                        help='config module name or .py file (default: config)')
+    parser.add_argument('--size', nargs='+', type=paper_size_arg, metavar='SIZE',
+                        help='paper width(s): A4, A5, A6, LETTER, ... or pixels '
+                             '(default: PAPER_SIZE from the config)')
+    parser.add_argument('--participants', metavar='FILE',
+                        help="guest list (.csv, .tsv, .jsonl, .txt or '-' for stdin) "
+                             "instead of PARTICIPANTS")
+    parser.add_argument('--participants-format', choices=['csv', 'tsv', 'jsonl', 'txt'],
+                        help="guest list format when the file extension doesn't tell "
+                             "(default: from the extension, txt for stdin)")
+    parser.add_argument('--column', default='name',
+                        help="name column(s) for CSV / JSONL lists, comma-separated "
+                             "to join several (default: name)")
+    parser.add_argument('--output', metavar='DIR',
+                        help='output folder (default: OUTPUT_FOLDER from the config)')
+    parser.add_argument('--format', default='png', choices=['png', 'pdf', 'zip', 'svg'],
+                        help='one image per card, one PDF, one ZIP or SVG files (default: png)')
+    parser.add_argument('--encoder', metavar='PRESET',
+                        help='image encoder preset, e.g. png-fast, png-palette, webp, jpeg')
+    parser.add_argument('--variant', action='append', type=variant_arg, default=[],
+                        metavar='SPEC',
+                        help='also write a downsampled copy of every card from the same render: '
+                             'a preset (email, thumb) or NAME=WIDTH[:ENCODER], e.g. '
+                             'web=1600:webp (repeatable)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes, 0 for one per CPU core (default: 1)')
+    parser.add_argument('--shard', type=shard_arg, metavar='I/N',
+                        help='render only shard I (0-based) of N, e.g. one per machine; '
+                             'combine them with: python shards.py merge OUTPUT')
+    parser.add_argument('--compact', action='store_true',
+                        help='render into 256-colour palette images instead of RGB: less '
+                             'memory and faster PNG encoding, near-identical pixels')
+    parser.add_argument('--full', action='store_true',
+                        help='re-render every card, even unchanged ones')
+    parser.add_argument('--font-dir', action='append', default=[], metavar='DIR',
+                        help='extra font folder, searched before the system ones (repeatable)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='lay out the cards only: heights, overflow warnings and '
+                             'estimated output size; nothing is rendered or written')
+    parser.add_argument('--proof', action='store_true',
+                        help='write proof contact sheets (labelled thumbnails, warnings '
+                             'flagged) to the output folder instead of the cards')
+    parser.add_argument('--per-page', type=int, default=100,
+                        help='with --proof: thumbnails per sheet (default: 100)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and re-render the affected cards whenever the '
+                             'config (or guest list file) is saved')
+    parser.add_argument('--report', metavar='CSV',
+                        help='with --dry-run: write every card\'s height and warnings to CSV')
+    return parser
+
+
+def dry_run(participants, config, paper_sizes, output_format, encoder, report_path=None,
+            config_name='config'):
+    """Lay out every card without rendering it and print what a real run would produce"""
+    from invite import InvitationCardGenerator
+    from preflight import check_cards, check_config, estimate_card_bytes, format_bytes, summarize
+    
+    started = time.perf_counter()
+    participants = list(participants)
+    
+    print(f"\n{'='*60}")
+    print(f"Dry Run (layout only, nothing is rendered or written)")
+    print(f"{'='*60}")
+    print(f"Config: {config_name}")
+    print(f"Participants: {len(participants)}")
+    print(f"{'='*60}\n")
+    
+    rows = []
+    for paper_size in paper_sizes:
+        generator = InvitationCardGenerator(paper_size)
+        checks = list(check_cards(participants, config, generator))
+        heights, flagged = summarize(checks)
+        
+        print(f"📐 {generator.size_name} ({generator.width} px wide):")
+        for (height, lines), count in sorted(heights.items()):
+            print(f"   {generator.width} × {height} px  {count:>7} card(s)  "
+                  f"(greeting on {lines} line{'s' if lines > 1 else ''})")
+        
+        for issue in check_config(config, generator):
+            print(f"⚠️  Card text: {issue}")
+        if flagged:
+            print(f"⚠️  {len(flagged)} card(s) with warnings:")
+            for check in flagged[:20]:
+                print(f"   - {check.participant}: {'; '.join(check.issues)}")
+            if len(flagged) > 20:
+                print(f"   ... and {len(flagged) - 20} more"
+                      f"{'' if report_path else ' (--report FILE lists them all)'}")
+        
+        if participants:
+            value, per_pixel = estimate_card_bytes(config, generator, participants[0],
+                                                   output_format, encoder)
+            if per_pixel:
+                total = sum(value * generator.width * check.height for check in checks)
+            else:
+                total = value * len(checks)
+            print(f"💾 Estimated output: {format_bytes(total)} {output_format.upper()} "
+                  f"(~{format_bytes(total / len(checks))} per card)\n")
+        
+        rows.extend((generator.size_name, check) for check in checks)
+    
+    if report_path:
+        import csv
+        with open(report_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['participant', 'paper_size', 'height', 'greeting_lines', 'warnings'])
+            for size_name, check in rows:
+                writer.writerow([check.participant, size_name, check.height,
+                                 check.greeting_lines, '; '.join(check.issues)])
+        print(f"📄 Report: {report_path}")
+    print(f"⏱️  Checked in {time.perf_counter() - started:.2f} s\n")
+
+
+def main(argv=None):
+    """Generate invitation cards with auto-fit height based on a config module"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.report and not args.dry_run:
+        parser.error("--report needs --dry-run")
+    if args.watch and (args.dry_run or args.proof or args.shard):
+        parser.error("--watch can't be combined with --dry-run, --proof or --shard")
+    
+    try:
+        config = load_config(args.config)
+    except (ImportError, FileNotFoundError) as e:
+        parser.error(str(e))
+    
+    from invite import generate_all_invitations, set_font_dirs
+    from participants import load_participants
+    
+    # Optional FONT_DIRS (older configs don't define it)
+    font_dirs = args.font_dir + list(getattr(config, 'FONT_DIRS', None) or [])
+    if font_dirs:
+        set_font_dirs(font_dirs)
+    
+    # PARTICIPANTS is a list of names or a guest list file (.csv, .jsonl, .txt)
+    participants = args.participants or config.PARTICIPANTS
+    if isinstance(participants, str):
+        column = args.column.split(',') if ',' in args.column else args.column
+        participants = load_participants(participants, format=args.participants_format,
+                                         column=column)
+    
+    paper_size = args.size or [config.PAPER_SIZE]
+    if not (args.dry_run or args.proof):
+        # The same combinations generate_all_invitations refuses, caught
+        # before anything is loaded or rendered
+        if len(paper_size) > 1 and args.format != 'png':
+            parser.error("several --size values need --format png")
+        if args.shard and args.format != 'png':
+            parser.error("--shard needs --format png")
+    output_folder = args.output or getattr(config, 'OUTPUT_FOLDER', 'output')
+    
+    encoder = None
+    if args.encoder:
+        from outputs import ENCODER_PRESETS
+        if args.encoder not in ENCODER_PRESETS:
+            parser.error(f"Unknown encoder preset: {args.encoder}. "
+                         f"Available: {list(ENCODER_PRESETS)}")
+        encoder = ENCODER_PRESETS[args.encoder]
+    
+    variants = []
+    if args.variant:
+        from outputs import ENCODER_PRESETS, VARIANT_PRESETS, OutputVariant
+        if args.format != 'png' or len(paper_size) > 1:
+            parser.error("--variant needs --format png and a single --size")
+        for name, width, preset in args.variant:
+            if width is None:
+                if name not in VARIANT_PRESETS:
+                    parser.error(f"Unknown variant preset: {name}. "
+                                 f"Available: {list(VARIANT_PRESETS)}")
+                variants.append(VARIANT_PRESETS[name])
+                continue
+            if preset is not None and preset not in ENCODER_PRESETS:
+                parser.error(f"Unknown encoder preset: {preset}. "
+                             f"Available: {list(ENCODER_PRESETS)}")
+            try:
+                variants.append(OutputVariant(name, width, ENCODER_PRESETS.get(preset)))
+            except ValueError as e:
+                parser.error(str(e))
+    
+    if args.watch:
+        from watch import ConfigWatcher
+        watcher = ConfigWatcher(config.__file__, args.participants, args.column, args.size,
+                                args.output, args.format, encoder, args.font_dir, args.compact,
+                                args.participants_format)
+        watcher.run(full=args.full)
+        return
+    
+    if args.dry_run:
+        dry_run(participants, config.EVENT_CONFIG, paper_size, args.format, encoder,
+                args.report, args.config)
+        return
+    
+    if args.proof:
+        from proof import proof_sheets
+        participants = list(participants)
+        for size in paper_size:
+            started = time.perf_counter()
+            paths, flagged = proof_sheets(participants, config.EVENT_CONFIG, size, output_folder,
+                                          per_page=args.per_page, workers=args.workers or None,
+                                          output_format='pdf' if args.format == 'pdf' else 'png')
+            print(f"\n🔍 Proof of {len(participants)} cards at {size}: "
+                  f"{paths[0] if len(paths) == 1 else f'{len(paths)} sheets'} "
+                  f"({time.perf_counter() - started:.1f} s)")
+            if flagged:
+                print(f"⚠️  {len(flagged)} card(s) flagged:")
+                for participant, page, issues in flagged[:20]:
+                    print(f"   - page {page}: {participant}: {'; '.join(issues)}")
+                if len(flagged) > 20:
+                    print(f"   ... and {len(flagged) - 20} more")
+        print()
+        return
     
     # Generate all invitations
     generated_files = generate_all_invitations(
-        participants=PARTICIPANTS,
-        config=EVENT_CONFIG,
-        paper_size=PAPER_SIZE,
-        output_folder=OUTPUT_FOLDER
+        participants=participants,
+        config=config.EVENT_CONFIG,
+        paper_size=paper_size[0] if len(paper_size) == 1 else paper_size,
+        output_folder=output_folder,
+        workers=args.workers or None,
+        incremental=not args.full,
+        output_format=args.format,
+        encoder=encoder,
+        shard=args.shard,
+        compact=args.compact,
+        variants=variants,
     )
     
     print("\n📊 Summary:")
-    print(f"   Total cards generated: {len(generated_files)}")
-    print(f"   Paper width: {PAPER_SIZE}")
+    print(f"   Total files written: {len(generated_files)}")
+    print(f"   Paper width: {', '.join(map(str, paper_size))}")
     print(f"   Height: Auto-calculated (no white space!)")
-    print(f"   Saved to: {OUTPUT_FOLDER}/\n")
+    print(f"   Saved to: {output_folder}/\n")
 
 if __name__ == "__main__":
     main()
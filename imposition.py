@@ -0,0 +1,174 @@
+"""
+N-up imposition: pack rendered cards onto print sheets
+Cards keep their auto-fit height, so sheets are packed with a shelf algorithm
+"""
+
+from PIL import Image, ImageDraw, ImageOps
+
+
+# ===== PRINT SHEET SIZES (portrait, pixels at 300 DPI) =====
+SHEET_SIZES = {
+    'A4': (2480, 3508),      # 210 × 297 mm
+    'A3': (3508, 4961),      # 297 × 420 mm
+    'LETTER': (2550, 3300),  # 8.5 × 11 inches
+}
+
+
+class _Sheet:
+    """
+    One print sheet being filled shelf by shelf
+    
+    Cards are placed left to right on shelves (rows); a new shelf opens
+    below the last one when a card doesn't fit on any existing shelf.
+    Placed cards are kept until the sheet is composed so the finished
+    layout can be centered on the page.
+    """
+    
+    def __init__(self, width, height, margin, gutter):
+        self.width = width
+        self.height = height
+        self.usable_width = width - 2 * margin
+        self.usable_height = height - 2 * margin
+        self.margin = margin
+        self.gutter = gutter
+        self.shelves = []     # [y, shelf height, next free x]
+        self.placements = []  # (slot image, x, y) relative to the usable area
+    
+    def place(self, slot):
+        """Put a slot image on the sheet; returns False if there is no room"""
+        slot_width, slot_height = slot.size
+        
+        for shelf in self.shelves:
+            y, shelf_height, x = shelf
+            if slot_height <= shelf_height and x + slot_width <= self.usable_width:
+                self.placements.append((slot, x, y))
+                shelf[2] = x + slot_width + self.gutter
+                return True
+        
+        y = self.shelves[-1][0] + self.shelves[-1][1] + self.gutter if self.shelves else 0
+        if y + slot_height <= self.usable_height and slot_width <= self.usable_width:
+            self.shelves.append([y, slot_height, slot_width + self.gutter])
+            self.placements.append((slot, 0, y))
+            return True
+        
+        return False
+    
+    def compose(self, background, bleed, crop_marks, mark_length, mark_color):
+        """Paste all placed cards, centered, and draw crop marks"""
+        sheet = Image.new('RGB', (self.width, self.height), background)
+        
+        # Center the used area on the sheet
+        used_width = max(x + slot.width for slot, x, _ in self.placements)
+        used_height = max(y + slot.height for slot, _, y in self.placements)
+        offset_x = self.margin + (self.usable_width - used_width) // 2
+        offset_y = self.margin + (self.usable_height - used_height) // 2
+        
+        for slot, x, y in self.placements:
+            sheet.paste(slot, (offset_x + x, offset_y + y))
+        
+        # Marks are drawn after every card so no bleed area paints over them
+        if crop_marks:
+            draw = ImageDraw.Draw(sheet)
+            for slot, x, y in self.placements:
+                left = offset_x + x + bleed
+                top = offset_y + y + bleed
+                right = left + slot.width - 2 * bleed
+                bottom = top + slot.height - 2 * bleed
+                _draw_crop_marks(draw, left, top, right, bottom, bleed, mark_length, mark_color)
+        
+        return sheet
+
+
+def _draw_crop_marks(draw, left, top, right, bottom, bleed, length, color):
+    """Draw trim marks just outside the bleed at each corner of a card"""
+    for x in (left, right):
+        draw.line([(x, top - bleed - length), (x, top - bleed)], fill=color, width=2)
+        draw.line([(x, bottom + bleed), (x, bottom + bleed + length)], fill=color, width=2)
+    for y in (top, bottom):
+        draw.line([(left - bleed - length, y), (left - bleed, y)], fill=color, width=2)
+        draw.line([(right + bleed, y), (right + bleed + length, y)], fill=color, width=2)
+
+
+def _add_bleed(card, bleed):
+    """Extend the card by `bleed` pixels of its own background color"""
+    if bleed <= 0:
+        return card
+    return ImageOps.expand(card, border=bleed, fill=card.getpixel((0, 0)))
+
+
+def cards_per_sheet(card_size, sheet_size, bleed=36, margin=60, gutter=24):
+    """How many cards of one size fit on a sheet in a plain grid"""
+    slot_width = card_size[0] + 2 * bleed
+    slot_height = card_size[1] + 2 * bleed
+    usable_width = sheet_size[0] - 2 * margin
+    usable_height = sheet_size[1] - 2 * margin
+    across = (usable_width + gutter) // (slot_width + gutter)
+    down = (usable_height + gutter) // (slot_height + gutter)
+    return max(0, across) * max(0, down)
+
+
+def resolve_sheet_size(sheet_size):
+    """Turn a SHEET_SIZES name or (width, height) tuple into portrait pixels"""
+    if isinstance(sheet_size, str):
+        if sheet_size.upper() not in SHEET_SIZES:
+            raise ValueError(f"Unknown sheet size: {sheet_size}. Available: {list(SHEET_SIZES.keys())}")
+        return SHEET_SIZES[sheet_size.upper()]
+    width, height = sheet_size
+    return min(width, height), max(width, height)
+
+
+def impose_cards(cards, sheet_size='A4', orientation='auto', bleed=36, margin=60, gutter=24,
+                 crop_marks=True, mark_length=40, open_sheets=2, background='white',
+                 mark_color='black'):
+    """
+    Pack card images onto print sheets, yielding each sheet when it is full
+    
+    Cards are placed first-fit on the shelves of the last few open sheets, so
+    cards of varying height still fill gaps while memory stays bounded by
+    open_sheets sheets' worth of cards. Nothing is written to disk.
+    
+    Args:
+        cards: Iterable of PIL Images (e.g. from iter_cards)
+        sheet_size: SHEET_SIZES name or (width, height) in pixels
+        orientation: 'portrait', 'landscape' or 'auto' (whichever fits more
+            copies of the first card)
+        bleed: Bleed added around each card in pixels (36 px = 3 mm at 300 DPI)
+        margin: Unprintable margin around the sheet in pixels
+        gutter: Extra space between neighbouring cards in pixels
+        crop_marks: Draw trim marks at every card corner
+        mark_length: Length of the crop marks in pixels
+        open_sheets: Sheets kept open for first-fit placement
+        background: Sheet color
+        mark_color: Crop mark color
+    
+    Yields:
+        PIL Image for each finished sheet
+    """
+    width, height = resolve_sheet_size(sheet_size)
+    sheets = []
+    
+    for card in cards:
+        slot = _add_bleed(card.convert('RGB'), bleed)
+        
+        # Pick the orientation that fits more copies of the first card
+        if orientation == 'auto':
+            portrait = cards_per_sheet(card.size, (width, height), bleed, margin, gutter)
+            landscape = cards_per_sheet(card.size, (height, width), bleed, margin, gutter)
+            orientation = 'landscape' if landscape > portrait else 'portrait'
+        if orientation == 'landscape':
+            width, height = max(width, height), min(width, height)
+        
+        if any(sheet.place(slot) for sheet in sheets):
+            continue
+        
+        if len(sheets) >= open_sheets:
+            yield sheets.pop(0).compose(background, bleed, crop_marks, mark_length, mark_color)
+        
+        sheet = _Sheet(width, height, margin, gutter)
+        if not sheet.place(slot):
+            raise ValueError(f"Card of {card.width} × {card.height} px (plus bleed) "
+                             f"doesn't fit on a {width} × {height} px sheet")
+        sheets.append(sheet)
+    
+    for sheet in sheets:
+        yield sheet.compose(background, bleed, crop_marks, mark_length, mark_color)
@@ -3,9 +3,129 @@ Invitation Card Generator with Auto-Fit Height
 Card height automatically adjusts to content length
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageChops, ImageDraw
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+import hashlib
+import itertools
 import os
-import math
+import json
+import re
+
+from decorations import DEFAULT_ORNAMENTS, ORNAMENT_STYLES, SPRITES
+# FontRegistry and TextMetrics (and their shared instances) live in fonts
+# and are re-exported here for existing imports
+from fonts import (FONT_DIRS, FONT_LIBRARY, FONT_REGISTRY, TEXT_METRICS, FontRegistry, TextMetrics,
+                   draw_text)
+from imposition import impose_cards
+from outputs import CardEncoder, StreamingPdfWriter, StreamingZipWriter, encode_pdf_page
+from pipeline import pipelined, write_file
+from timing import RenderStats, timed
+
+
+# Bump whenever a change to the drawing code alters rendered output, so
+# incremental batch runs re-render cards made by an older renderer
+RENDERER_VERSION = '4'
+
+# Compact cards (InvitationCardGenerator(compact=True)) are 256-colour
+# palette images: flat colours are exact and no pixel of any channel is more
+# than this many levels (of 255) off the RGB render. A card that can't stay
+# within it is returned as RGB instead.
+COMPACT_TOLERANCE = 8
+
+
+# ===== FONT FALLBACK CHAINS =====
+# Font file names (found in fonts.FONT_LIBRARY's directories) or paths. The
+# first installed face is the card's font; each character it has no glyph
+# for is drawn with the first later face that has one.
+SCRIPT_FONT_PATHS = (
+    "NotoSansArabic-Regular.ttf",
+    "NotoNaskhArabic-Regular.ttf",
+    "NotoSansHebrew-Regular.ttf",
+    "NotoSansDevanagari-Regular.ttf",
+    "NotoSansThai-Regular.ttf",
+    "NotoSansCJK-Regular.ttc",
+    "NotoSansCJKsc-Regular.otf",
+    "wqy-microhei.ttc",
+    "NotoEmoji-Regular.ttf",
+    "NotoSansSymbols2-Regular.ttf",
+    "Symbola.ttf",
+    "seguiemj.ttf",
+    "seguisym.ttf",
+    "Arial Unicode.ttf",
+)
+BOLD_FONT_PATHS = (
+    "DejaVuSerif-Bold.ttf",
+    "DejaVuSans-Bold.ttf",
+    "NotoSansArabic-Bold.ttf",
+    "NotoSansHebrew-Bold.ttf",
+    "NotoSansCJK-Bold.ttc",
+) + SCRIPT_FONT_PATHS
+REGULAR_FONT_PATHS = (
+    "DejaVuSans.ttf",
+) + SCRIPT_FONT_PATHS
+
+
+def set_font_dirs(directories):
+    """
+    Search these directories (in order) for fonts before the system font
+    directories
+    
+    Also exported as INVITE_FONT_DIRS, so worker processes use them too.
+    Generators created before the change keep the fonts they loaded.
+    """
+    directories = [os.path.abspath(os.path.expanduser(directory)) for directory in directories]
+    os.environ['INVITE_FONT_DIRS'] = os.pathsep.join(directories)
+    FONT_LIBRARY.set_directories(directories + list(FONT_DIRS))
+    FONT_REGISTRY.clear()
+    TEXT_METRICS.clear()
+
+
+# ===== LAYOUT ELEMENTS =====
+# A card layout is a list of positioned elements, drawn in order. Fonts are
+# font roles ('title', 'body', ...) and colors are keys of config['colors'],
+# both resolved when drawing.
+TextElement = namedtuple('TextElement', ['x', 'y', 'text', 'font', 'color'])
+RectElement = namedtuple('RectElement', ['box', 'fill', 'outline', 'width'])
+HexagonElement = namedtuple('HexagonElement', ['x', 'y', 'size', 'color', 'width'])
+PatternElement = namedtuple('PatternElement', ['box', 'style', 'size', 'color', 'width'])
+CardLayout = namedtuple('CardLayout', ['elements', 'height', 'greeting_y'])
+
+# One participant's card as recorded by InvitationCardGenerator.record: the
+# static layout (and its cache key), the greeting elements and the width
+# they were laid out at, so the card can be replayed at any other width
+DisplayList = namedtuple('DisplayList', ['key', 'width', 'layout', 'greeting'])
+
+
+def scale_element(element, factor):
+    """Layout element with positions, sizes and line widths scaled by factor"""
+    def px(value):
+        return int(round(value * factor))
+    
+    def line(width):
+        return max(1, px(width))
+    
+    if isinstance(element, TextElement):
+        return element._replace(x=px(element.x), y=px(element.y))
+    if isinstance(element, RectElement):
+        return element._replace(box=[px(value) for value in element.box], width=line(element.width))
+    if isinstance(element, HexagonElement):
+        return element._replace(x=element.x * factor, y=element.y * factor,
+                                size=px(element.size), width=line(element.width))
+    if isinstance(element, PatternElement):
+        return element._replace(box=[px(value) for value in element.box],
+                                size=max(2, px(element.size)), width=line(element.width))
+    return element
+
+
+def scale_layout(layout, factor):
+    """CardLayout scaled by factor (font roles are resolved at the new size when drawn)"""
+    if factor == 1:
+        return layout
+    return CardLayout([scale_element(element, factor) for element in layout.elements],
+                      int(round(layout.height * factor)), int(round(layout.greeting_y * factor)))
+
 
 class InvitationCardGenerator:
     """
@@ -23,13 +143,30 @@ class InvitationCardGenerator:
         'SQUARE': 2000,   # Square-ish width
     }
     
-    def __init__(self, paper_size='A5'):
+    # Page heights of the named sizes (a taller auto-fit card won't fit the page)
+    PAPER_HEIGHTS = {
+        'A4': 3508,
+        'A5': 2480,
+        'A6': 1748,
+        'LETTER': 3300,
+        'CARD_5X7': 2100,
+    }
+    
+    # Number of layouts / rendered card templates kept per generator
+    TEMPLATE_CACHE_SIZE = 8
+    
+    def __init__(self, paper_size='A5', timer=None, compact=False):
         """
         Initialize the generator with specified paper width
         Height will be calculated based on content
         
         Args:
             paper_size: Paper size name ('A4', 'A5', etc.) or custom width (int)
+            timer: Optional callable(phase, seconds) receiving per-phase
+                render timings (see timing.RenderStats)
+            compact: Render cards from a template as palette ('P') images
+                instead of RGB - a third of the memory and much faster PNG
+                encoding, within COMPACT_TOLERANCE of the RGB card
         """
         # Set card width
         if isinstance(paper_size, str):
@@ -44,6 +181,9 @@ class InvitationCardGenerator:
         else:
             raise ValueError("paper_size must be a string or int (width)")
         
+        # Kept so worker processes can build an identical generator
+        self.paper_size = paper_size
+        
         # Height will be calculated based on content
         self.height = None
         
@@ -54,6 +194,14 @@ class InvitationCardGenerator:
         # Initialize scaled values
         self._init_scaled_values()
         
+        # Fonts, layouts and rendered templates, filled lazily
+        self._fonts = None
+        self._layouts = {}
+        self._templates = {}
+        
+        self.timer = timer
+        self.compact = compact
+    
     def _init_scaled_values(self):
         """Calculate all scaled values based on card width"""
         s = self.scale  # Shorthand for scale
@@ -80,99 +228,34 @@ class InvitationCardGenerator:
         # Box dimensions
         self.box_padding = int(30 * s)  # Reduced from 40
         self.box_line_height = int(45 * s)  # Reduced from 50
-        
+    
     def _calculate_content_height(self, config):
         """
         Calculate required height based on content
-        Returns the total height needed for all content
+        Returns the total height needed for all content (with a one-line
+        greeting; see card_height for a specific participant)
         """
-        height = 0
-        
-        # Top padding
-        height += self.padding
-        
-        # Title
-        height += int(self.font_sizes['title'] * 1.3)
-        
-        # Subtitle
-        height += self.section_spacing
-        
-        # Greeting
-        height += self.section_spacing
-        
-        # Introduction lines
-        intro_lines = config['texts']['introduction']
-        height += len(intro_lines) * self.line_spacing
-        height += self.section_spacing
-        
-        # Event details box
-        details_count = len(config['event']['details'])
-        box_height = details_count * self.box_line_height + self.box_padding * 2
-        height += box_height
-        height += self.section_spacing
-        
-        # Agenda title
-        height += int(self.font_sizes['heading'] * 1.5)
-        
-        # Agenda items
-        agenda_count = len(config['agenda'])
-        height += agenda_count * self.line_spacing
-        height += self.section_spacing
-        
-        # Thank you message
-        height += self.line_spacing
-        height += self.section_spacing
-        
-        # Closing
-        height += self.line_spacing * 2
-        
-        # Bottom padding
-        height += self.padding
-        
-        return height
+        return self.get_layout(config)[1].height
+    
+    def card_height(self, config, participant_name):
+        """Height of a participant's card (long names may wrap the greeting)"""
+        greeting_lines = self._wrap_greeting(config, participant_name, self._load_fonts())
+        return self.get_layout(config, len(greeting_lines))[1].height
     
     def _get_font(self, size):
         """Load font with specified size, fallback to default if not available"""
-        try:
-            return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf", size)
-        except:
-            try:
-                return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size)
-            except:
-                return ImageFont.load_default()
+        return FONT_REGISTRY.get(BOLD_FONT_PATHS, size)
     
     def _get_regular_font(self, size):
         """Load regular (non-bold) font"""
-        try:
-            return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size)
-        except:
-            return ImageFont.load_default()
-    
-    def _draw_centered_text(self, draw, text, y, font, color):
-        """Draw text centered horizontally"""
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        x = (self.width - text_width) // 2
-        draw.text((x, y), text, font=font, fill=color)
-        return bbox[3] - bbox[1]  # Return text height
+        return FONT_REGISTRY.get(REGULAR_FONT_PATHS, size)
     
     def _draw_text(self, draw, text, x, y, font, color):
-        """Draw text at specified position"""
-        draw.text((x, y), text, font=font, fill=color)
-    
-    def _draw_hexagon(self, draw, x, y, size, color, width=2):
-        """Draw a hexagon shape"""
-        angles = [i * 60 for i in range(6)]
-        points = []
-        for angle in angles:
-            rad = math.radians(angle)
-            px = x + size * math.cos(rad)
-            py = y + size * math.sin(rad)
-            points.append((px, py))
-        draw.polygon(points, outline=color, width=width)
-    
-    def _draw_honeycomb_pattern(self, draw, accent_color):
-        """Draw decorative honeycomb pattern in corners (scaled)"""
+        """Draw text at specified position (per-character font fallback included)"""
+        draw_text(draw, (x, y), text, font, color)
+    
+    def _honeycomb_elements(self, height):
+        """Decorative honeycomb pattern in corners (scaled)"""
         hex_size = self.hex_size
         spacing = int(hex_size * 1.4)
         
@@ -192,179 +275,1428 @@ class InvitationCardGenerator:
         
         # Bottom left
         positions_bl = [
-            (self.padding * 0.7, self.height - self.padding * 0.7),
-            (self.padding * 0.7 + spacing, self.height - self.padding * 0.7 - spacing * 0.5),
-            (self.padding * 0.7 + spacing * 2, self.height - self.padding * 0.7),
+            (self.padding * 0.7, height - self.padding * 0.7),
+            (self.padding * 0.7 + spacing, height - self.padding * 0.7 - spacing * 0.5),
+            (self.padding * 0.7 + spacing * 2, height - self.padding * 0.7),
         ]
         
         all_positions = positions_tl + positions_tr + positions_bl
+        line_width = max(2, int(2 * self.scale))
         
-        for x, y in all_positions:
-            self._draw_hexagon(draw, x, y, hex_size, accent_color, width=max(2, int(2 * self.scale)))
+        return [HexagonElement(x, y, hex_size, 'accent', line_width) for x, y in all_positions]
     
-    def generate_card(self, config, participant_name, output_folder='output'):
+    def _ornament_elements(self, config, height):
         """
-        Generate a single invitation card with auto-fit height
+        Ornaments listed in config['ornaments'] (default: corner honeycombs)
         
-        Args:
-            config: Dictionary containing event details and styling
-            participant_name: Name of the participant
-            output_folder: Folder to save the card
+        Returns:
+            (elements under the border, elements over it)
+        """
+        styles = config.get('ornaments', DEFAULT_ORNAMENTS)
+        unknown = [style for style in styles if style not in ORNAMENT_STYLES]
+        if unknown:
+            raise ValueError(f"Unknown ornament(s): {unknown}. Available: {list(ORNAMENT_STYLES)}")
+        
+        # Inside the border frame
+        inner = self.border_width + self.border_thickness
+        box = [inner, inner, self.width - inner, height - inner]
+        line_width = max(1, int(1.5 * self.scale))
+        under, over = [], []
+        
+        if 'background' in styles:
+            # Tiled honeycomb in the optional 'pattern' color
+            color = 'pattern' if 'pattern' in config['colors'] else 'box_bg'
+            under.append(PatternElement(box, 'background', self.hex_size, color, line_width))
+        if 'border' in styles:
+            # Band of small cells just inside the frame, clear of the content
+            over.append(PatternElement(box, 'border', int(self.hex_size * 0.4), 'accent', line_width))
+        if 'corners' in styles:
+            over.extend(self._honeycomb_elements(height))
+        return under, over
+    
+    def _load_fonts(self):
+        """Load every font role used on the card (once per generator)"""
+        if self._fonts is None:
+            with timed(self.timer, 'fonts'):
+                self._fonts = {
+                    'title': self._get_font(self.font_sizes['title']),
+                    'subtitle': self._get_font(self.font_sizes['subtitle']),
+                    'heading': self._get_font(self.font_sizes['heading']),
+                    'body': self._get_regular_font(self.font_sizes['body']),
+                    'small': self._get_regular_font(self.font_sizes['small']),
+                }
+        return self._fonts
+    
+    def _advance(self, fonts, font, spacing):
+        """Vertical step after a line: the designed spacing, or more if the font needs it"""
+        ascent, descent = TEXT_METRICS.line_metrics(fonts[font])
+        return max(spacing, ascent + descent)
+    
+    def _add_lines(self, elements, fonts, lines, x, y, font, color, line_spacing, last_spacing,
+                   center=False):
+        """
+        Append wrapped lines as text elements
         
         Returns:
-            Path to the generated card
+            Y position after the block (last_spacing below the last line)
         """
+        for i, line in enumerate(lines):
+            if center:
+                x = (self.width - TEXT_METRICS.width(fonts[font], line)) // 2
+            elements.append(TextElement(x, y, line, font, color))
+            spacing = line_spacing if i < len(lines) - 1 else last_spacing
+            y += self._advance(fonts, font, spacing)
+        return y
+    
+    def _greeting_text(self, config, participant_name):
+        texts = config['texts']
+        return f"{texts['greeting_prefix']} {participant_name}{texts['greeting_suffix']}"
+    
+    def _wrap_greeting(self, config, participant_name, fonts):
+        """Greeting wrapped to the card width (not memoized, it's unique per guest)"""
+        return TEXT_METRICS.wrap(fonts['heading'], self._greeting_text(config, participant_name),
+                                 self.width - 2 * self.padding, cache=False)
+    
+    def _build_layout(self, config, greeting_lines=1):
+        """
+        Lay out every participant-independent element of the card
         
-        # Calculate required height based on content
-        self.height = self._calculate_content_height(config)
+        Text is measured and wrapped to the card width, and the card height
+        is taken from where the last line ends, so drawing and height always
+        agree. The greeting is the only per-participant text; its slot is
+        greeting_lines lines tall, so a long name that wraps pushes the rest
+        of the card down instead of overlapping it.
         
-        # Extract configuration
+        Returns:
+            CardLayout - positioned elements in draw order, card height and
+            the Y position of the first greeting line
+        """
+        fonts = self._load_fonts()
         event = config['event']
         agenda = config['agenda']
-        colors = config['colors']
         texts = config['texts']
-        
-        # Create image
-        img = Image.new('RGB', (self.width, self.height), colors['background'])
-        draw = ImageDraw.Draw(img)
-        
-        # Add decorative border
-        draw.rectangle(
-            [self.border_width, self.border_width, 
-             self.width - self.border_width, self.height - self.border_width],
-            outline=colors['accent'],
-            width=self.border_thickness
-        )
-        
-        # Add honeycomb pattern
-        self._draw_honeycomb_pattern(draw, colors['accent'])
-        
-        # Load fonts
-        fonts = {
-            'title': self._get_font(self.font_sizes['title']),
-            'subtitle': self._get_font(self.font_sizes['subtitle']),
-            'heading': self._get_font(self.font_sizes['heading']),
-            'body': self._get_regular_font(self.font_sizes['body']),
-            'small': self._get_regular_font(self.font_sizes['small']),
-        }
+        content_width = self.width - 2 * self.padding
+        wrap = TEXT_METRICS.wrap
+        elements = []
         
         # Current Y position
         y_pos = self.padding
         
         # === TITLE ===
-        self._draw_centered_text(draw, event['title'], y_pos, fonts['title'], colors['accent'])
-        y_pos += int(self.font_sizes['title'] * 1.3)
+        title_spacing = int(self.font_sizes['title'] * 1.3)
+        y_pos = self._add_lines(elements, fonts, wrap(fonts['title'], event['title'], content_width),
+                                0, y_pos, 'title', 'accent', title_spacing, title_spacing,
+                                center=True)
         
-        self._draw_centered_text(draw, event['subtitle'], y_pos, fonts['subtitle'], colors['accent'])
-        y_pos += self.section_spacing
+        y_pos = self._add_lines(elements, fonts,
+                                wrap(fonts['subtitle'], event['subtitle'], content_width),
+                                0, y_pos, 'subtitle', 'accent', int(self.font_sizes['subtitle'] * 1.2),
+                                self.section_spacing, center=True)
         
-        # === GREETING ===
-        greeting = f"{texts['greeting_prefix']} {participant_name}{texts['greeting_suffix']}"
-        self._draw_text(draw, greeting, self.padding, y_pos, fonts['heading'], colors['text'])
-        y_pos += self.section_spacing
+        # === GREETING (drawn per participant) ===
+        greeting_y = y_pos
+        y_pos += (self._advance(fonts, 'heading', int(self.font_sizes['heading'] * 1.3)) * (greeting_lines - 1)
+                  + self._advance(fonts, 'heading', self.section_spacing))
         
         # === INTRODUCTION ===
-        intro_lines = texts['introduction']
-        for line in intro_lines:
-            self._draw_text(draw, line, self.padding, y_pos, fonts['body'], colors['text'])
-            y_pos += self.line_spacing
-        y_pos += self.section_spacing - self.line_spacing
+        intro_lines = [line for text in texts['introduction']
+                       for line in wrap(fonts['body'], text, content_width)]
+        y_pos = self._add_lines(elements, fonts, intro_lines, self.padding, y_pos, 'body', 'text',
+                                self.line_spacing, self.section_spacing)
         
         # === EVENT DETAILS BOX ===
-        box_height = len(event['details']) * self.box_line_height + self.box_padding * 2
         box_left = self.padding
         box_right = self.width - self.padding
+        detail_lines = [line for detail in event['details']
+                        for line in wrap(fonts['body'], detail, content_width - 2 * self.box_padding)]
+        box_height = len(detail_lines) * self.box_line_height + self.box_padding * 2
         
-        draw.rectangle(
-            [box_left, y_pos, box_right, y_pos + box_height],
-            fill=colors['box_bg'],
-            outline=colors['accent'],
-            width=max(2, int(3 * self.scale))
-        )
-        
-        box_y = y_pos + self.box_padding
-        for detail in event['details']:
-            self._draw_text(draw, detail, box_left + self.box_padding, box_y, 
-                          fonts['body'], colors['text'])
-            box_y += self.box_line_height
+        elements.append(RectElement([box_left, y_pos, box_right, y_pos + box_height],
+                                    'box_bg', 'accent', max(2, int(3 * self.scale))))
+        self._add_lines(elements, fonts, detail_lines, box_left + self.box_padding,
+                        y_pos + self.box_padding, 'body', 'text',
+                        self.box_line_height, self.box_line_height)
         
         y_pos += box_height + self.section_spacing
         
         # === AGENDA ===
-        self._draw_centered_text(draw, texts['agenda_title'], y_pos, fonts['heading'], colors['accent'])
-        y_pos += int(self.font_sizes['heading'] * 1.5)
+        y_pos = self._add_lines(elements, fonts,
+                                wrap(fonts['heading'], texts['agenda_title'], content_width),
+                                0, y_pos, 'heading', 'accent', int(self.font_sizes['heading'] * 1.3),
+                                int(self.font_sizes['heading'] * 1.5), center=True)
         
+        agenda_x = self.padding * 1.3
+        agenda_width = self.width - agenda_x - self.padding
         for i, item in enumerate(agenda, 1):
-            agenda_text = f"{i}. {item}"
-            self._draw_text(draw, agenda_text, self.padding * 1.3, y_pos, fonts['body'], colors['text'])
-            y_pos += self.line_spacing
-        
-        y_pos += self.section_spacing - self.line_spacing
+            # Numbered items with a hanging indent for wrapped lines
+            number = f"{i}. "
+            indent = TEXT_METRICS.width(fonts['body'], number)
+            lines = wrap(fonts['body'], item, agenda_width - indent)
+            last_spacing = self.section_spacing if i == len(agenda) else self.line_spacing
+            y_pos = self._add_lines(elements, fonts, [number + lines[0]], agenda_x, y_pos,
+                                    'body', 'text', self.line_spacing,
+                                    last_spacing if len(lines) == 1 else self.line_spacing)
+            if len(lines) > 1:
+                y_pos = self._add_lines(elements, fonts, lines[1:], agenda_x + indent, y_pos,
+                                        'body', 'text', self.line_spacing, last_spacing)
         
         # === THANK YOU ===
-        self._draw_centered_text(draw, texts['thanks'], y_pos, fonts['body'], colors['text'])
-        y_pos += self.section_spacing
+        y_pos = self._add_lines(elements, fonts, wrap(fonts['body'], texts['thanks'], content_width),
+                                0, y_pos, 'body', 'text', self.line_spacing, self.section_spacing,
+                                center=True)
         
         # === CLOSING ===
-        self._draw_text(draw, texts['closing'], self.padding, y_pos, fonts['body'], colors['text'])
-        y_pos += self.line_spacing
-        self._draw_text(draw, texts['signature'], self.padding, y_pos, fonts['heading'], colors['accent'])
+        y_pos = self._add_lines(elements, fonts, wrap(fonts['body'], texts['closing'], content_width),
+                                self.padding, y_pos, 'body', 'text',
+                                self.line_spacing, self.line_spacing)
+        y_pos = self._add_lines(elements, fonts,
+                                wrap(fonts['heading'], texts['signature'], content_width),
+                                self.padding, y_pos, 'heading', 'accent',
+                                int(self.font_sizes['heading'] * 1.3), self.line_spacing)
         
-        # Save the card
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
+        # Bottom padding, keeping the bottom-left honeycomb clear of the signature
+        honeycomb_top = self.padding * 0.7 + int(self.hex_size * 1.4) * 0.5 + self.hex_size
+        height = y_pos + max(self.padding, int(honeycomb_top) + self.line_spacing)
+        
+        # Border and ornaments go under everything else
+        border = RectElement([self.border_width, self.border_width,
+                              self.width - self.border_width, height - self.border_width],
+                             None, 'accent', self.border_thickness)
+        under, over = self._ornament_elements(config, height)
+        elements = under + [border] + over + elements
+        
+        return CardLayout(elements, height, greeting_y)
+    
+    def _cache_put(self, cache, key, value):
+        """Insert into a per-generator cache, dropping the oldest entry when full"""
+        if len(cache) >= self.TEMPLATE_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[key] = value
+    
+    def get_layout(self, config, greeting_lines=1):
+        """
+        Return the (memoized) layout for a config and greeting height
         
-        filename = f"{participant_name.replace(' ', '_')}_invitation_{self.size_name}.png"
-        filepath = os.path.join(output_folder, filename)
-        img.save(filepath, quality=95, dpi=(300, 300))
+        Layouts are cached per generator (i.e. per paper width) and keyed by
+        the config contents, so editing the config in place invalidates them.
+        
+        Returns:
+            (cache key, CardLayout)
+        """
+        with timed(self.timer, 'layout_key'):
+            key = (json.dumps(config, sort_keys=True, default=str), greeting_lines)
+            layout = self._layouts.get(key)
+        if layout is None:
+            with timed(self.timer, 'layout'):
+                layout = self._build_layout(config, greeting_lines)
+            self._cache_put(self._layouts, key, layout)
+        return key, layout
+    
+    def _draw_elements(self, img, elements, fonts, colors):
+        """Draw layout elements in order (ornaments are pasted as cached sprites)"""
+        draw = ImageDraw.Draw(img)
+        for element in elements:
+            if isinstance(element, TextElement):
+                self._draw_text(draw, element.text, element.x, element.y,
+                                fonts[element.font], colors[element.color])
+            elif isinstance(element, RectElement):
+                draw.rectangle(element.box, fill=colors[element.fill] if element.fill else None,
+                               outline=colors[element.outline], width=element.width)
+            elif isinstance(element, HexagonElement):
+                SPRITES.paste_hexagon(img, element.x, element.y, element.size, element.width,
+                                      colors[element.color])
+            elif isinstance(element, PatternElement):
+                SPRITES.paste_pattern(img, element.style, element.box, element.size,
+                                      element.width, colors[element.color])
+    
+    def _render_layout(self, config, layout, fonts):
+        """Draw every participant-independent layer of the card"""
+        img = Image.new('RGB', (self.width, layout.height), config['colors']['background'])
+        self._draw_elements(img, layout.elements, fonts, config['colors'])
+        return img
+    
+    def _get_template(self, key, config, layout):
+        """
+        Return the cached static layers for a layout, rendering on first use
+        
+        Everything except the greeting is the same for all participants, so
+        this is rendered once per (config, paper width, greeting lines).
+        """
+        template = self._templates.get(key)
+        if template is None:
+            with timed(self.timer, 'template'):
+                template = self._render_layout(config, layout, self._load_fonts())
+                if self.compact:
+                    template = _to_palette(template)
+            self._cache_put(self._templates, key, template)
+        return template
+    
+    def _draw_compact(self, img, elements, fonts, colors):
+        """
+        Draw text elements onto a palette card
+        
+        The text's bounding box is cut out, drawn in RGB exactly as on an RGB
+        card and mapped back to the card's palette. If that would move a
+        pixel more than COMPACT_TOLERANCE, the card is returned as RGB.
+        
+        Returns:
+            The card (img itself, or an RGB copy)
+        """
+        boxes = []
+        for element in elements:
+            left, top, right, bottom = fonts[element.font].getbbox(element.text)
+            boxes.append((element.x + left, element.y + top, element.x + right, element.y + bottom))
+        if not boxes:
+            return img
+        box = (max(0, min(box[0] for box in boxes) - 2), max(0, min(box[1] for box in boxes) - 2),
+               min(img.width, max(box[2] for box in boxes) + 2),
+               min(img.height, max(box[3] for box in boxes) + 2))
+        
+        region = img.crop(box).convert('RGB')
+        self._draw_elements(region, [element._replace(x=element.x - box[0], y=element.y - box[1])
+                                     for element in elements], fonts, colors)
+        mapped = region.quantize(palette=img, dither=Image.Dither.NONE)
+        if _max_difference(region, mapped) > COMPACT_TOLERANCE:
+            img = img.convert('RGB')
+            img.paste(region, box[:2])
+        else:
+            img.paste(mapped, box[:2])
+        return img
+    
+    def record(self, config, participant_name):
+        """
+        Lay out a participant's card once, as a replayable display list
+        
+        The display list holds every draw operation (text with its font role,
+        rectangles, ornaments) at this generator's width; replay() draws it
+        at any width.
+        
+        Returns:
+            DisplayList
+        """
+        fonts = self._load_fonts()
+        
+        # Only the greeting is measured per participant
+        with timed(self.timer, 'layout'):
+            greeting_lines = self._wrap_greeting(config, participant_name, fonts)
+        key, layout = self.get_layout(config, len(greeting_lines))
+        
+        greeting = []
+        self._add_lines(greeting, fonts, greeting_lines, self.padding, layout.greeting_y,
+                        'heading', 'text', int(self.font_sizes['heading'] * 1.3), 0)
+        return DisplayList(key, self.width, layout, greeting)
+    
+    def _scaled_layout(self, key, layout, factor):
+        """Static layout of another width scaled to this one (memoized)"""
+        if factor == 1:
+            return layout
+        scaled = self._layouts.get(key)
+        if scaled is None:
+            with timed(self.timer, 'layout'):
+                scaled = scale_layout(layout, factor)
+            self._cache_put(self._layouts, key, scaled)
+        return scaled
+    
+    def replay(self, config, display_list, use_template=True):
+        """
+        Draw a display list (see record) at this generator's width
+        
+        Positions, sizes and line widths are scaled by the ratio of the
+        widths and text is drawn with this generator's font for each role,
+        so one layout pass can feed every paper size. Replayed at the width
+        it was recorded at, the card is exactly what render_card draws.
+        
+        Args:
+            config: Configuration dictionary the display list was recorded from
+            display_list: Result of record() on any generator
+            use_template: Reuse the cached participant-independent layers
+        
+        Returns:
+            PIL Image of the card
+        """
+        fonts = self._load_fonts()
+        factor = self.width / display_list.width
+        key = display_list.key if factor == 1 else (display_list.key, display_list.width)
+        layout = self._scaled_layout(key, display_list.layout, factor)
+        self.height = layout.height
+        
+        if use_template:
+            template = self._get_template(key, config, layout)
+        
+        # === GREETING ===
+        with timed(self.timer, 'draw'):
+            if use_template:
+                img = template.copy()
+            else:
+                img = self._render_layout(config, layout, fonts)
+            greeting = display_list.greeting
+            if factor != 1:
+                greeting = [scale_element(element, factor) for element in greeting]
+            if img.mode == 'P':
+                img = self._draw_compact(img, greeting, fonts, config['colors'])
+            else:
+                self._draw_elements(img, greeting, fonts, config['colors'])
+        
+        return img
+    
+    def render_card(self, config, participant_name, use_template=True):
+        """
+        Render a single invitation card in memory with auto-fit height
+        
+        Args:
+            config: Dictionary containing event details and styling
+            participant_name: Name of the participant
+            use_template: Reuse the cached participant-independent layers and
+                only draw the greeting (pixel-identical to a full redraw)
+        
+        Returns:
+            PIL Image of the card
+        """
+        return self.replay(config, self.record(config, participant_name), use_template)
+    
+    def card_filename(self, participant_name, extension='.png', variant=None, clash=False):
+        """
+        File name used for a participant's card (or its named variant) at this paper size
+        
+        clash: Another participant of the batch has a name that differs
+            only in case (see case_clashes), so the name is made unique
+            with a hash (see safe_name)
+        """
+        suffix = f"_{variant}" if variant else ''
+        return (f"{safe_name(participant_name, clash)}_invitation_{self.size_name}"
+                f"{suffix}{extension}")
+    
+    def generate_card(self, config, participant_name, output_folder='output', use_template=True,
+                      encoder=None):
+        """
+        Generate a single invitation card with auto-fit height
+        
+        Args:
+            config: Dictionary containing event details and styling
+            participant_name: Name of the participant
+            output_folder: Folder to save the card
+            use_template: Reuse the cached participant-independent layers and
+                only draw the greeting (pixel-identical to a full redraw)
+            encoder: CardEncoder for the file format (default: 300 DPI PNG)
+        
+        Returns:
+            Path to the generated card
+        """
+        encoder = encoder or DEFAULT_ENCODER
+        img = self.render_card(config, participant_name, use_template)
+        
+        # Save the card
+        os.makedirs(output_folder, exist_ok=True)
+        filepath = os.path.join(output_folder,
+                                self.card_filename(participant_name, encoder.extension))
+        save_card(img, filepath, self.timer, encoder)
         
         return filepath
 
 
-def generate_all_invitations(participants, config, paper_size='A5', output_folder='output'):
+# 300 DPI PNG at Pillow's default compression
+DEFAULT_ENCODER = CardEncoder('PNG')
+
+
+def _max_difference(img, other):
+    """Largest per-channel difference between an RGB image and another image"""
+    difference = ImageChops.difference(img, other.convert('RGB'))
+    return max(high for _, high in difference.getextrema())
+
+
+def _to_palette(img):
     """
-    Generate invitation cards for all participants with auto-fit height
+    A card template as a 256-colour palette image, or img itself if that
+    would move a pixel more than COMPACT_TOLERANCE
+    
+    Maximum coverage keeps the large flat areas exact and spends the palette
+    on anti-aliasing shades.
+    """
+    palette = img.quantize(256, method=Image.Quantize.MAXCOVERAGE, dither=Image.Dither.NONE)
+    if _max_difference(img, palette) > COMPACT_TOLERANCE:
+        return img
+    return palette
+
+
+# Characters kept as-is in file names (letters and digits of any script too)
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w\-.,'()&+]")
+MAX_NAME_LENGTH = 100
+
+
+def safe_name(participant_name, clash=False):
+    """
+    File-name-safe form of a participant name
+    
+    Spaces become underscores. Any other change (slashes, control or other
+    special characters, underscores already in the name, a leading dot, a
+    very long name) appends a short hash of the original name, so distinct
+    names never map to the same file and no name can leave the output folder.
+    With clash (the name only differs in case from another one in the
+    batch, see case_clashes) the hash is always appended, so the two files
+    stay apart on case-insensitive file systems.
+    """
+    name = participant_name.replace(' ', '_')
+    safe = _UNSAFE_FILENAME_CHARS.sub('_', name).lstrip('.')[:MAX_NAME_LENGTH]
+    if safe == name and '_' not in participant_name and not clash:
+        return safe
+    digest = hashlib.sha256(participant_name.encode('utf-8')).hexdigest()[:10]
+    return f"{safe}_{digest}" if safe else digest
+
+
+def case_clashes(participants):
+    """
+    Participants whose file name differs from another one's only in case
+    
+    "Anna Lee" and "anna lee" get distinct safe names, but they are the
+    same file on Windows and macOS. Every name of such a group is returned
+    (not just the later ones), so which file gets which name doesn't depend
+    on the order of the guest list.
+    
+    Returns:
+        Set of participant names to pass to card_filename as clash
+    """
+    owners = {}  # casefolded safe name -> first participant using it
+    clashing = set()
+    for participant in participants:
+        if not isinstance(participant, str):
+            continue  # fails as a card of its own
+        owner = owners.setdefault(safe_name(participant).casefold(), participant)
+        if owner != participant:
+            clashing.update((owner, participant))
+    return clashing
+
+
+def save_card(img, filepath, timer=None, encoder=None):
+    """Write a rendered card to disk (300 DPI PNG unless an encoder is given)"""
+    with timed(timer, 'encode'):
+        data = (encoder or DEFAULT_ENCODER).encode(img)
+    with timed(timer, 'write'):
+        write_file(data, filepath)
+
+
+def iter_cards(participants, config, paper_size='A5', image_format=None, use_template=True,
+               timer=None, generator=None):
+    """
+    Lazily render invitation cards one at a time, without touching disk
+    
+    Only one card is held in memory at a time, so memory stays flat however
+    long the participant list is.
     
     Args:
-        participants: List of participant names
+        participants: Iterable of participant names
         config: Configuration dictionary with event details
         paper_size: Paper width preset or custom width
+        image_format: None to yield PIL Images, or a format name (e.g. 'PNG')
+            or CardEncoder to yield the encoded bytes
+        use_template: Render the shared card background only once
+        timer: Optional callable(phase, seconds) for per-phase timings
+        generator: InvitationCardGenerator to render with (keeping its
+            cached layouts and templates) instead of a new one for paper_size
+    
+    Yields:
+        (participant, image) or (participant, bytes) tuples
+    """
+    if generator is None:
+        generator = InvitationCardGenerator(paper_size, timer)
+    encoder = image_format
+    if isinstance(image_format, str):
+        encoder = CardEncoder(image_format)
+    
+    for participant in participants:
+        img = generator.render_card(config, participant, use_template)
+        if encoder is None:
+            yield participant, img
+        else:
+            with timed(timer, 'encode'):
+                data = encoder.encode(img)
+            yield participant, data
+
+
+def _widest(paper_sizes, timer=None, compact=False):
+    """Generators for several paper sizes, plus the widest one to lay out at"""
+    generators = [InvitationCardGenerator(paper_size, timer, compact) for paper_size in paper_sizes]
+    if not generators:
+        raise ValueError("At least one paper size is needed")
+    return max(generators, key=lambda generator: generator.width), generators
+
+
+def iter_cards_multi(participants, config, paper_sizes, use_template=True, timer=None):
+    """
+    Lazily render every participant at several paper sizes, laid out once
+    
+    Each card is laid out at the widest size and the display list is
+    replayed at the others (see InvitationCardGenerator.replay), so text
+    breaks the same way on every size and layout runs once per participant.
+    
+    Yields:
+        (participant, {size name: image}) tuples
+    """
+    reference, generators = _widest(paper_sizes, timer)
+    for participant in participants:
+        display_list = reference.record(config, participant)
+        yield participant, {generator.size_name: generator.replay(config, display_list, use_template)
+                            for generator in generators}
+
+
+def variant_size_name(size_name, variant):
+    """Manifest size key of a card's downsampled variant, e.g. 'A5>1000'"""
+    return f"{size_name}>{variant.width}"
+
+
+def replay_size_name(generator, reference):
+    """Manifest size key of a card replayed from reference's layout"""
+    if generator.width == reference.width:
+        return generator.size_name
+    return f"{generator.size_name}<{reference.size_name}"
+
+
+# ===== BATCH MANIFEST (incremental / resumable runs) =====
+MANIFEST_FILENAME = 'manifest.json'
+SHARD_MANIFEST_FILENAME = 'manifest.shard-{index}-of-{count}.json'
+
+# Config sections that affect the rendered card
+RENDER_CONFIG_KEYS = ('event', 'agenda', 'texts', 'colors', 'ornaments')
+
+
+def config_digest(config):
+    """Hash of the config sections that affect rendering"""
+    subset = {key: config[key] for key in RENDER_CONFIG_KEYS if key in config}
+    payload = json.dumps(subset, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def card_input_hash(config_hash, participant_name, size_name, encoder=None, compact=False):
+    """
+    Hash of everything a single card is rendered from
+    
+    Args:
+        config_hash: Result of config_digest() for the batch config
+        participant_name: Name of the participant
+        size_name: Generator size name ('A5', 'CUSTOM_1500', ...)
+        encoder: CardEncoder the file is written with
+        compact: The card is rendered as a palette image
+    """
+    inputs = [RENDERER_VERSION, config_hash, size_name, participant_name,
+              (encoder or DEFAULT_ENCODER).cache_key()]
+    if compact:
+        inputs.append('compact')  # RGB hashes stay as they were
+    payload = json.dumps(inputs)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def shard_of(participant_name, shard_count):
+    """
+    Shard (0-based) a participant belongs to
+    
+    Derived from a hash of the name, so the assignment is the same on every
+    run, machine and Python version, whatever the order of the guest list.
+    """
+    digest = hashlib.sha256(participant_name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+class BatchManifest:
+    """
+    Manifest of rendered cards kept in the output folder
+    
+    Maps each output file name to the participant, paper size and input hash
+    it was rendered from. It is saved every flush_every cards (and when the
+    batch ends, even on error) so an interrupted run can resume. For large
+    manifests the interval grows to 5% of the entries, so rewriting the
+    whole file stays a small share of the batch.
+    
+    A sharded run (shard = (index, count)) keeps its own manifest file, so
+    shards can share an output folder; shards.merge_shard_manifests
+    combines them.
+    """
+    
+    def __init__(self, output_folder, flush_every=100, shard=None):
+        self.output_folder = output_folder
+        self.shard = shard
+        filename = MANIFEST_FILENAME
+        if shard is not None:
+            filename = SHARD_MANIFEST_FILENAME.format(index=shard[0], count=shard[1])
+        self.path = os.path.join(output_folder, filename)
+        self.flush_every = flush_every
+        self.entries = {}
+        self._unsaved = 0
+        
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (OSError, ValueError):
+                print(f"⚠️  Ignoring unreadable manifest: {self.path}")
+    
+    def is_current(self, filename, input_hash):
+        """True if the file exists and was rendered from the same inputs"""
+        entry = self.entries.get(filename)
+        return (entry is not None and entry['hash'] == input_hash
+                and os.path.exists(os.path.join(self.output_folder, filename)))
+    
+    def record(self, filename, participant_name, size_name, input_hash):
+        """Add a freshly rendered card, saving periodically"""
+        self.entries[filename] = {
+            'participant': participant_name,
+            'paper_size': size_name,
+            'hash': input_hash,
+        }
+        self._unsaved += 1
+        if self._unsaved >= max(self.flush_every, len(self.entries) // 20):
+            self.save()
+    
+    def stale_files(self, current_filenames, size_name):
+        """Files of this paper size whose participant is no longer in the batch"""
+        return sorted(filename for filename, entry in self.entries.items()
+                      if entry['paper_size'] == size_name and filename not in current_filenames)
+    
+    def save(self):
+        """Write the manifest atomically"""
+        os.makedirs(self.output_folder, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        data = {'renderer_version': RENDERER_VERSION, 'files': self.entries}
+        if self.shard is not None:
+            data['shard'] = list(self.shard)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+def _card_outputs(generator, targets, encoder, variants):
+    """
+    (generator, encoder, variant name, manifest size key) of each file a card is written to
+    
+    With targets the card is laid out at generator and replayed onto every
+    target size; otherwise it is rendered once at generator and written
+    with encoder and each of variants.
+    """
+    if targets:
+        return [(target, encoder, None, replay_size_name(target, generator)) for target in targets]
+    size_name = generator.size_name
+    return [(generator, encoder, None, size_name)] + [
+        (generator, variant, variant.name, variant_size_name(size_name, variant))
+        for variant in variants]
+
+
+def _render_outputs(generator, outputs, config, participant, use_template, replay=False):
+    """Yield (output, image) for each of _card_outputs, drawing every size once"""
+    display_list = generator.record(config, participant) if replay else None
+    current = img = None
+    for output in outputs:
+        target = output[0]
+        if target is not current:
+            current = target
+            if replay:
+                img = target.replay(config, display_list, use_template)
+            else:
+                img = target.render_card(config, participant, use_template)
+        yield output, img
+
+
+# ===== PARALLEL BATCH WORKERS =====
+# Each worker process builds its generator once, so fonts and the card
+# template are loaded once per worker rather than once per card.
+_worker_state = {}
+
+
+def _init_worker(paper_size, config, output_folder, use_template, output_format, timed_run,
+                 encoder, target_sizes=(), compact=False, variants=()):
+    """Initialize the per-process generator(s) for parallel batches"""
+    # Timings are collected locally and shipped back with each chunk
+    stats = RenderStats() if timed_run else None
+    _worker_state['generator'] = InvitationCardGenerator(paper_size, stats, compact)
+    _worker_state['targets'] = [InvitationCardGenerator(size, stats, compact)
+                                for size in target_sizes]
+    _worker_state['stats'] = stats
+    _worker_state['job'] = (config, output_folder, use_template, output_format, encoder)
+    _worker_state['outputs'] = _card_outputs(_worker_state['generator'], _worker_state['targets'],
+                                             encoder, variants)
+
+
+def _render_chunk(chunk):
+    """
+    Render a chunk of (index, participant) pairs inside a worker process
+    
+    'files' cards are written by the worker itself, at every target size
+    or with their variants (see _card_outputs), to the file names chosen by
+    the main process (chunk items are then (index, participant, file
+    names)); PDF pages are encoded in the worker and returned for the main
+    process to append, 'bytes' returns the encoded image (e.g. for a ZIP
+    archive) and 'image' returns the raw pixels (and the palette of a
+    compact card) for the main process to compose.
+    Failures are caught per card so one bad participant doesn't lose the
+    rest of the chunk.
+    
+    Returns:
+        (results, timings) - list of (index, participant, result or None,
+        error or None) and the phase timings of this chunk (or None)
+    """
+    generator = _worker_state['generator']
+    stats = _worker_state['stats']
+    config, output_folder, use_template, output_format, encoder = _worker_state['job']
+    results = []
+    for index, participant, *filenames in chunk:
+        try:
+            if output_format == 'pdf':
+                img = generator.render_card(config, participant, use_template)
+                with timed(stats, 'encode'):
+                    result = encode_pdf_page(img)
+            elif output_format == 'bytes':
+                img = generator.render_card(config, participant, use_template)
+                with timed(stats, 'encode'):
+                    result = encoder.encode(img)
+            elif output_format == 'image':
+                img = generator.render_card(config, participant, use_template)
+                palette = img.getpalette() if img.mode == 'P' else None
+                result = (img.mode, img.size, img.tobytes(), palette)
+            else:
+                result = []
+                images = _render_outputs(generator, _worker_state['outputs'], config,
+                                         participant, use_template,
+                                         replay=bool(_worker_state['targets']))
+                for filename, ((_, card_encoder, _, _), img) in zip(filenames[0], images):
+                    filepath = os.path.join(output_folder, filename)
+                    save_card(img, filepath, stats, card_encoder)
+                    result.append(filepath)
+            results.append((index, participant, result, None))
+        except Exception as e:
+            results.append((index, participant, None, f"{type(e).__name__}: {e}"))
+    return results, (stats.drain() if stats is not None else None)
+
+
+def _chunked(items, chunk_size):
+    """Split an iterable into lists of chunk_size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Progress:
+    """Running count of handled participants (with a percentage if the total is known)"""
+    
+    def __init__(self, total=None):
+        self.total = total
+        self.done = 0
+    
+    def step(self):
+        """Count one participant and return the progress label"""
+        self.done += 1
+        if self.total:
+            return f"[{self.done}/{self.total} {self.done / self.total:.0%}]"
+        return f"[{self.done}]"
+
+
+class _BatchJob:
+    """Settings shared by the batch output helpers of generate_all_invitations"""
+    
+    def __init__(self, config, generator, output_folder, use_template=True, workers=1,
+                 chunk_size=16, timer=None, encoder=None, total=None, collect_paths=True,
+                 targets=None, pipeline_depth=8, encode_threads=2, shard=None, variants=None,
+                 clashes=None):
+        self.config = config
+        self.generator = generator
+        self.targets = targets or []  # generators to replay onto in multi-size runs
+        self.output_folder = output_folder
+        self.use_template = use_template
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timer = timer
+        self.encoder = encoder or DEFAULT_ENCODER
+        self.progress = _Progress(total)
+        self.collect_paths = collect_paths
+        self.pipeline_depth = pipeline_depth
+        self.encode_threads = encode_threads
+        self.shard = shard  # (index, count) of a sharded run
+        self.variants = list(variants or [])  # OutputVariants written with every card
+        self.clashes = clashes or set()  # names needing a hashed file name (case_clashes)
+    
+    def iter_cards(self, participants, image_format=None):
+        """Render (and optionally encode) participants serially in this process"""
+        return iter_cards(participants, self.config, image_format=image_format,
+                          use_template=self.use_template, timer=self.timer,
+                          generator=self.generator)
+    
+    def write_cards(self, cards):
+        """
+        Encode and write (key, image, filepath) cards, overlapped with rendering
+        
+        Yields (key, filepath) in input order as files are written.
+        """
+        return pipelined(cards, self.encoder.encode, self.pipeline_depth, self.encode_threads,
+                         self.timer)
+
+
+def _iter_parallel(indexed_participants, job, output_format='files', ordered=False):
+    """
+    Render (index, participant) pairs on a process pool
+    
+    At most two chunks per worker are in flight at once, so memory stays
+    bounded however long the participant list is. Phase timings measured
+    in the workers are replayed into job.timer.
+    
+    Yields:
+        (index, participant, result or None, error or None) - in participant
+        order if ordered is set, otherwise as chunks complete
+    """
+    chunks = _chunked(indexed_participants, job.chunk_size)
+    in_flight = deque()
+    
+    with ProcessPoolExecutor(max_workers=job.workers, initializer=_init_worker,
+                             initargs=(job.generator.paper_size, job.config, job.output_folder,
+                                       job.use_template, output_format,
+                                       job.timer is not None, job.encoder,
+                                       tuple(target.paper_size for target in job.targets),
+                                       job.generator.compact, job.variants)) as pool:
+        def submit_next():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                in_flight.append((pool.submit(_render_chunk, chunk), chunk))
+        
+        for _ in range(job.workers * 2):
+            submit_next()
+        
+        while in_flight:
+            if ordered:
+                future, chunk = in_flight.popleft()
+            else:
+                done, _ = wait([f for f, _ in in_flight], return_when=FIRST_COMPLETED)
+                future, chunk = next(item for item in in_flight if item[0] in done)
+                in_flight.remove((future, chunk))
+            
+            try:
+                results, timings = future.result()
+            except Exception as e:
+                # The worker itself died; report every card in its chunk
+                results = [(index, participant, None, f"worker failed: {type(e).__name__}: {e}")
+                           for index, participant, *_ in chunk]
+                timings = None
+            
+            for phase, values in (timings or {}).items():
+                for seconds in values:
+                    job.timer(phase, seconds)
+            
+            submit_next()
+            yield from results
+
+
+def _iter_images(participants, job, failures):
+    """
+    Yield (participant, image) in participant order, serially or on a pool
+    
+    Cards that fail in a worker are appended to failures and skipped.
+    """
+    if job.workers <= 1:
+        yield from job.iter_cards(participants)
+        return
+    
+    results = _iter_parallel(enumerate(participants), job, output_format='image', ordered=True)
+    for index, participant, result, error in results:
+        if error is None:
+            mode, size, data, palette = result
+            img = Image.frombytes(mode, size, data)
+            if palette is not None:
+                img.putpalette(palette)
+            yield participant, img
+        else:
+            failures.append((participant, error))
+            print(f"✗ {job.progress.step()} Failed invitation for {participant}: {error}")
+
+
+def _generate_files(participants, job, incremental):
+    """
+    Write image files for every participant, skipping cards that are up to date
+    
+    A card is written once per output (see _card_outputs): at job.generator
+    and job.variants, or laid out once at job.generator (the widest size)
+    and replayed onto each of job.targets. A participant is skipped only
+    when all its files are up to date. Participants are consumed lazily;
+    apart from the manifest, only the file names seen so far (for the
+    stale-file check) grow with the batch.
+    
+    Returns:
+        (filepaths, failures, skipped) - paths in participant order (None if
+        job.collect_paths is off, a participant's files together), a list
+        of (participant, error) tuples and the number of up-to-date
+        participants
+    """
+    generator = job.generator
+    output_folder = job.output_folder
+    manifest = BatchManifest(output_folder, shard=job.shard)
+    config_hash = config_digest(job.config)
+    outputs = _card_outputs(generator, job.targets, job.encoder, job.variants)
+    
+    seen = set()       # file names produced by this batch
+    rendering = {}     # index -> [(file name, size key, input hash)] of cards being rendered
+    indexed_paths = [] if job.collect_paths else None
+    failures = []
+    skipped = 0
+    
+    def pending():
+        """Yield (index, participant, file names) for cards that need rendering"""
+        nonlocal skipped
+        for index, participant in enumerate(participants):
+            clash = participant in job.clashes
+            files = []
+            for target, encoder, variant, size_key in outputs:
+                filename = target.card_filename(participant, encoder.extension, variant, clash)
+                seen.add(filename)
+                files.append((filename, size_key,
+                              card_input_hash(config_hash, participant, size_key, encoder,
+                                              generator.compact)))
+            if incremental and all(manifest.is_current(filename, input_hash)
+                                   for filename, _, input_hash in files):
+                skipped += 1
+                job.progress.step()
+                if indexed_paths is not None:
+                    indexed_paths.extend((index, os.path.join(output_folder, filename))
+                                         for filename, _, _ in files)
+            else:
+                rendering[index] = files
+                yield index, participant, [filename for filename, _, _ in files]
+    
+    def created(index, participant, filepaths):
+        for (filename, size_key, input_hash), filepath in zip(rendering.pop(index), filepaths):
+            manifest.record(filename, participant, size_key, input_hash)
+            if indexed_paths is not None:
+                indexed_paths.append((index, filepath))
+        if job.targets:
+            print(f"✓ {job.progress.step()} Created {len(filepaths)} sizes for {participant}")
+        else:
+            extra = f" (+{len(filepaths) - 1} variants)" if len(filepaths) > 1 else ''
+            print(f"✓ {job.progress.step()} Created invitation for {participant}{extra}")
+    
+    try:
+        if job.workers > 1:
+            for index, participant, filepaths, error in _iter_parallel(pending(), job):
+                if error is None:
+                    created(index, participant, filepaths)
+                else:
+                    rendering.pop(index)
+                    failures.append((participant, error))
+                    print(f"✗ {job.progress.step()} Failed invitation for {participant}: {error}")
+        else:
+            # Render each card in memory; encoding (and downsampling the
+            # variants) and writing overlap with rendering the next cards
+            def rendered():
+                """(index, participant, image of each output) of the cards to render"""
+                if job.targets:
+                    for index, participant, _ in pending():
+                        yield index, participant, (img for _, img in _render_outputs(
+                            generator, outputs, job.config, participant, job.use_template,
+                            replay=True))
+                    return
+                
+                # One size: the card (shared by its variants) comes from iter_cards
+                order = deque()
+                
+                def names():
+                    for index, participant, _ in pending():
+                        order.append(index)
+                        yield participant
+                
+                for participant, img in job.iter_cards(names()):
+                    yield order.popleft(), participant, itertools.repeat(img)
+            
+            def cards():
+                for index, participant, images in rendered():
+                    for (filename, _, _), (_, encoder, _, _), img in zip(rendering[index],
+                                                                         outputs, images):
+                        yield ((index, participant), img, os.path.join(output_folder, filename),
+                               encoder.encode)
+            
+            # Files come back in order, so a participant's files are adjacent
+            filepaths = []
+            for (index, participant), filepath in job.write_cards(cards()):
+                filepaths.append(filepath)
+                if len(filepaths) == len(outputs):
+                    created(index, participant, filepaths)
+                    filepaths = []
+    finally:
+        # Keep progress even if the batch is interrupted
+        manifest.save()
+    
+    if skipped:
+        print(f"\n↻ {skipped} invitation(s) unchanged since last run, skipped")
+    
+    stale = [filename for _, _, _, size_key in outputs
+             for filename in manifest.stale_files(seen, size_key)]
+    if stale:
+        print(f"\n🗑️  {len(stale)} card(s) in {output_folder}/ are no longer produced by this batch:")
+        for filename in stale:
+            print(f"   - {filename}")
+    
+    if indexed_paths is None:
+        return None, failures, skipped
+    # Parallel results arrive as chunks complete
+    indexed_paths.sort(key=lambda item: item[0])
+    return [path for _, path in indexed_paths], failures, skipped
+
+
+def _generate_svg(participants, job):
+    """
+    Write one SVG file per participant
+    
+    SVG cards are a cached document with the greeting substituted in, so
+    they are rendered serially (far faster than a worker pool could start).
+    
+    Returns:
+        (filepaths, failures) - paths in participant order (None if
+        job.collect_paths is off) and a list of (participant, error)
+    """
+    from svg import SvgRenderer
+    
+    renderer = SvgRenderer(job.generator.paper_size, job.timer)
+    filepaths = [] if job.collect_paths else None
+    failures = []
+    for participant in participants:
+        try:
+            document = renderer.render(job.config, participant)
+            filepath = os.path.join(job.output_folder, renderer.card_filename(
+                participant, participant in job.clashes))
+            with timed(job.timer, 'write'):
+                write_file(document.encode('utf-8'), filepath)
+        except Exception as e:
+            failures.append((participant, f"{type(e).__name__}: {e}"))
+            print(f"✗ {job.progress.step()} Failed invitation for {participant}: {failures[-1][1]}")
+            continue
+        if filepaths is not None:
+            filepaths.append(filepath)
+        print(f"✓ {job.progress.step()} Created invitation for {participant}")
+    return filepaths, failures
+
+
+def _generate_pdf(participants, job):
+    """
+    Append every card as a page of one PDF, streamed page by page
+    
+    Returns:
+        (filepaths, failures) - the PDF path and a list of (participant, error)
+    """
+    pdf_path = os.path.join(job.output_folder, f"invitations_{job.generator.size_name}.pdf")
+    failures = []
+    
+    with StreamingPdfWriter(pdf_path, dpi=300) as pdf:
+        if job.workers > 1:
+            results = _iter_parallel(enumerate(participants), job, output_format='pdf',
+                                     ordered=True)
+            for index, participant, page, error in results:
+                if error is None:
+                    with timed(job.timer, 'write'):
+                        pdf.write_page(page)
+                    print(f"✓ {job.progress.step()} Added page for {participant}")
+                else:
+                    failures.append((participant, error))
+                    print(f"✗ {job.progress.step()} Failed invitation for {participant}: {error}")
+        else:
+            for participant, img in job.iter_cards(participants):
+                with timed(job.timer, 'encode'):
+                    page = encode_pdf_page(img)
+                with timed(job.timer, 'write'):
+                    pdf.write_page(page)
+                print(f"✓ {job.progress.step()} Added page for {participant}")
+    
+    return [pdf_path], failures
+
+
+def _generate_zip(participants, job):
+    """
+    Write every card into one ZIP archive as it is rendered
+    
+    Cards go from memory straight into the archive (no temporary files) and
+    are stored without recompression. The manifest, in the same format as
+    the output folder's manifest.json, is the last member written.
+    
+    Returns:
+        (filepaths, failures, duplicates) - the archive path, a list of
+        (participant, error) and the number of repeated participants left out
+    """
+    generator = job.generator
+    size_name = generator.size_name
+    zip_path = os.path.join(job.output_folder, f"invitations_{size_name}.zip")
+    config_hash = config_digest(job.config)
+    entries = {}
+    failures = []
+    duplicates = 0
+    
+    def add(archive, participant, data):
+        nonlocal duplicates
+        filename = generator.card_filename(participant, job.encoder.extension,
+                                           clash=participant in job.clashes)
+        with timed(job.timer, 'write'):
+            added = archive.add(filename, data)
+        if not added:
+            duplicates += 1
+            print(f"↻ {job.progress.step()} Skipped duplicate participant {participant}")
+            return
+        entries[filename] = {
+            'participant': participant,
+            'paper_size': size_name,
+            'hash': card_input_hash(config_hash, participant, size_name, job.encoder,
+                                    job.generator.compact),
+        }
+        print(f"✓ {job.progress.step()} Archived invitation for {participant}")
+    
+    with StreamingZipWriter(zip_path) as archive:
+        if job.workers > 1:
+            results = _iter_parallel(enumerate(participants), job, output_format='bytes',
+                                     ordered=True)
+            for index, participant, data, error in results:
+                if error is None:
+                    add(archive, participant, data)
+                else:
+                    failures.append((participant, error))
+                    print(f"✗ {job.progress.step()} Failed invitation for {participant}: {error}")
+        else:
+            for participant, data in job.iter_cards(participants, job.encoder):
+                add(archive, participant, data)
+        
+        archive.add_json(MANIFEST_FILENAME, {'renderer_version': RENDERER_VERSION,
+                                             'files': entries})
+    
+    return [zip_path], failures, duplicates
+
+
+def _generate_sheets(participants, job, sheet_size, output_format):
+    """
+    Impose cards N-up onto print sheets, written as PNGs or PDF pages
+    
+    Returns:
+        (filepaths, failures) - the sheet files (or the PDF) and a list of
+        (participant, error)
+    """
+    failures = []
+    size_name = job.generator.size_name
+    
+    def cards():
+        for participant, img in _iter_images(participants, job, failures):
+            print(f"✓ {job.progress.step()} Imposed invitation for {participant}")
+            yield img
+    
+    sheets = impose_cards(cards(), sheet_size)
+    sheet_name = sheet_size if isinstance(sheet_size, str) else 'x'.join(map(str, sheet_size))
+    
+    if output_format == 'pdf':
+        pdf_path = os.path.join(job.output_folder, f"sheets_{size_name}_on_{sheet_name}.pdf")
+        with StreamingPdfWriter(pdf_path, dpi=300) as pdf:
+            for sheet in sheets:
+                pdf.add_page(sheet)
+        return [pdf_path], failures
+    
+    filepaths = []
+    for number, sheet in enumerate(sheets, 1):
+        filepath = os.path.join(job.output_folder,
+                                f"sheet_{number:04d}_{size_name}_on_{sheet_name}{job.encoder.extension}")
+        save_card(sheet, filepath, job.timer, job.encoder)
+        filepaths.append(filepath)
+    return filepaths, failures
+
+
+def generate_all_invitations(participants, config, paper_size='A5', output_folder='output',
+                             use_template=True, workers=1, chunk_size=16, incremental=True,
+                             output_format='png', sheet_size=None, timer=None, encoder=None,
+                             collect_paths=True, pipeline_depth=8, encode_threads=2,
+                             shard=None, generator=None, compact=False, variants=None):
+    """
+    Generate invitation cards for all participants with auto-fit height
+    
+    Args:
+        participants: Participant names - a list, or any iterable such as
+            participants.load_participants('guests.csv'), consumed lazily
+        config: Configuration dictionary with event details
+        paper_size: Paper width preset or custom width, or a list of them
+            to write every card at each size from one layout pass (laid
+            out at the widest size and replayed at the others; image files
+            only)
         output_folder: Output directory
+        use_template: Render the shared card background once and only draw
+            the greeting per participant
+        workers: Number of worker processes (1 = serial, None = one per CPU core)
+        chunk_size: Participants handed to a worker at a time (parallel mode)
+        incremental: Skip cards whose file exists and whose inputs are
+            unchanged since the last run (per the manifest in output_folder)
+        output_format: 'png' for one image file per card, 'pdf' for a
+            single multi-page PDF (one 300 DPI page per card, streamed page
+            by page), or 'zip' for one archive of card images written as
+            they are rendered (manifest.json included, no loose files), or
+            'svg' for one vector SVG file per card (always fully rewritten)
+        sheet_size: Impose the cards N-up onto print sheets of this size
+            ('A4', 'A3', 'LETTER' or (width, height) px) with bleed and crop
+            marks; sheets are written as PNGs or PDF pages per output_format
+        timer: Optional callable(phase, seconds) timing every render phase
+            (fonts, template, layout, draw, encode, write); pass a
+            timing.RenderStats to get a summary report at the end
+        encoder: outputs.CardEncoder for image files (format, compression,
+            palette); file extensions follow its format. Default: 300 DPI PNG
+        collect_paths: Return the card file paths; turn off for very large
+            streamed batches so memory doesn't grow with the guest list
+        pipeline_depth: Image files rendered in this process (workers=1)
+            are encoded and written by background threads while the next
+            cards are drawn; at most this many cards are in flight (0 draws,
+            encodes and writes one card at a time)
+        encode_threads: Encoder threads for the pipeline
+        shard: (index, count) to render only the participants that
+            shard_of() assigns to shard index (0-based) of count, e.g. one
+            shard per machine; each shard keeps its own manifest, combined
+            afterwards with shards.merge_shard_manifests (image files only)
+        generator: InvitationCardGenerator of paper_size to render with,
+            e.g. kept across the runs of a watch loop so its layouts and
+            card templates stay cached (single paper size only)
+        compact: Render cards as 256-colour palette images instead of RGB:
+            a third of the memory per card in flight and much faster PNG
+            encoding, every pixel within COMPACT_TOLERANCE of the RGB card
+            (needs use_template)
+        variants: outputs.OutputVariants (e.g. outputs.VARIANT_PRESETS
+            ['email']) written with every card: each card is rendered once
+            at paper_size and downsampled to every variant's width, then all
+            its files are encoded and written together (image files at a
+            single paper size only)
     
     Returns:
-        List of generated file paths
+        List of card file paths (rendered or up to date), in participant
+        order, or [pdf_path] in PDF mode; None for image files when
+        collect_paths is off. In parallel mode failed cards are reported and
+        left out instead of aborting the batch.
     """
     
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    output_format = output_format.lower()
+    if output_format not in ('png', 'pdf', 'zip', 'svg'):
+        raise ValueError(f"Unknown output format: {output_format}. "
+                         f"Available: ['png', 'pdf', 'zip', 'svg']")
+    if sheet_size is not None and output_format in ('zip', 'svg'):
+        raise ValueError("Print sheets are written as PNG files or a PDF")
+    multi_size = isinstance(paper_size, (list, tuple))
+    if multi_size and (output_format != 'png' or sheet_size is not None):
+        raise ValueError("Several paper sizes at once are only supported for image files")
+    if variants and (output_format != 'png' or sheet_size is not None or multi_size):
+        raise ValueError("Output variants are only supported for image files at one paper size")
+    if not use_template and (compact or getattr(generator, 'compact', False)):
+        raise ValueError("Compact cards are drawn on the palette template (needs use_template)")
+    if shard is not None:
+        shard_index, shard_count = shard
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"Shard index must be in 0..{shard_count - 1}, got {shard_index}")
+        if output_format != 'png' or sheet_size is not None:
+            raise ValueError("Sharded runs are only supported for image files")
+    
     print(f"\n{'='*60}")
     print(f"Invitation Card Generator (Auto-Fit Height)")
     print(f"{'='*60}")
-    print(f"Paper Width: {paper_size}")
+    if multi_size:
+        print(f"Paper Width: {', '.join(map(str, paper_size))} (one layout pass per card)")
+    else:
+        print(f"Paper Width: {paper_size}")
     print(f"Height: Auto-calculated based on content")
-    print(f"Participants: {len(participants)}")
+    # Names clashing in case are found over the whole guest list, before
+    # sharding, so every shard names their files the same way
+    clashes = set()
+    if output_format in ('png', 'svg', 'zip') and sheet_size is None:
+        if iter(participants) is participants:
+            # A stream can only be read once
+            participants = list(participants)
+        clashes = case_clashes(participants)
+    # Streamed participants (generators, file loaders) have no length
+    total = len(participants) if hasattr(participants, '__len__') else None
+    if shard is not None:
+        participants = (participant for participant in participants
+                        if shard_of(participant, shard_count) == shard_index)
+        total = None
+        print(f"Shard: {shard_index} of {shard_count} (0-based, by name hash)")
+    print(f"Participants: {total if total is not None else 'streamed'}")
     print(f"Output: {output_folder}/")
+    if workers > 1:
+        print(f"Workers: {workers} processes (chunks of {chunk_size})")
+    if encoder is not None and output_format not in ('pdf', 'svg'):
+        print(f"Encoder: {encoder.describe()}")
+    if variants:
+        print(f"Variants: {', '.join(variant.describe() for variant in variants)}")
+    if compact and output_format != 'svg':
+        print(f"Render mode: compact (256-colour palette, within {COMPACT_TOLERANCE}/255 of RGB)")
     print(f"{'='*60}\n")
     
-    # Initialize generator
-    generator = InvitationCardGenerator(paper_size)
+    # Renders serial batches (workers build their own); also used for file
+    # names and the size summary
+    targets = None
+    if multi_size:
+        generator, targets = _widest(paper_size, timer, compact)
+    elif generator is None:
+        generator = InvitationCardGenerator(paper_size, timer, compact)
+    os.makedirs(output_folder, exist_ok=True)
+    job = _BatchJob(config, generator, output_folder, use_template, workers, chunk_size, timer,
+                    encoder, total, collect_paths, targets, pipeline_depth, encode_threads, shard,
+                    variants, clashes)
     
-    generated_files = []
+    skipped = duplicates = 0
+    if sheet_size is not None:
+        generated_files, failures = _generate_sheets(participants, job, sheet_size, output_format)
+    elif output_format == 'pdf':
+        generated_files, failures = _generate_pdf(participants, job)
+    elif output_format == 'zip':
+        generated_files, failures, duplicates = _generate_zip(participants, job)
+    elif output_format == 'svg':
+        generated_files, failures = _generate_svg(participants, job)
+    else:
+        generated_files, failures, skipped = _generate_files(participants, job, incremental)
     
-    # Generate card for each participant
-    for participant in participants:
-        filepath = generator.generate_card(config, participant, output_folder)
-        print(f"✓ Created invitation for {participant}")
-        generated_files.append(filepath)
+    if failures:
+        print(f"\n⚠️  {len(failures)} invitation(s) failed:")
+        for participant, error in failures:
+            print(f"   - {participant}: {error}")
     
     # Show actual dimensions after generation
-    if generated_files:
-        from PIL import Image
-        sample = Image.open(generated_files[0])
+    succeeded = job.progress.done - len(failures)
+    if succeeded:
+        height = generator._calculate_content_height(config)
         print(f"\n{'='*60}")
-        print(f"✓ Successfully generated {len(generated_files)} invitation cards!")
-        print(f"📐 Actual size: {sample.width} × {sample.height} pixels")
+        if sheet_size is not None:
+            print(f"✓ Successfully imposed {succeeded} invitation cards!")
+            print(f"🖨️  Sheets: {generated_files[0] if output_format == 'pdf' else len(generated_files)}")
+        elif output_format == 'pdf':
+            print(f"✓ Successfully generated {succeeded} invitation pages!")
+            print(f"📄 PDF: {generated_files[0]}")
+        elif output_format == 'zip':
+            print(f"✓ Successfully archived {succeeded - duplicates} invitation cards!")
+            print(f"🗜️  Archive: {generated_files[0]}")
+            if duplicates:
+                print(f"↻ Duplicate participants left out: {duplicates}")
+        elif multi_size:
+            print(f"✓ Successfully generated {succeeded - skipped} invitations "
+                  f"at {len(targets)} sizes!")
+        else:
+            print(f"✓ Successfully generated {succeeded - skipped} invitation cards!")
+        if skipped:
+            print(f"↻ Already up to date: {skipped}")
+        if multi_size:
+            for target in targets:
+                print(f"📐 {target.size_name}: {target.width} × "
+                      f"{int(round(height * target.width / generator.width))} pixels")
+        else:
+            print(f"📐 Actual size: {generator.width} × {height} pixels")
+        for variant in variants or []:
+            print(f"🖼️  {variant.name}: {variant.width} × "
+                  f"{max(1, round(height * variant.width / generator.width))} pixels")
         print(f"📁 Location: {output_folder}/")
+        for paths in FONT_REGISTRY.using_default_font():
+            print(f"⚠️  Font not found, used PIL default instead of: {paths[0]}")
         print(f"{'='*60}\n")
     
+    # Per-phase timing report
+    if isinstance(timer, RenderStats):
+        report_path = os.path.join(output_folder, 'timing_report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(timer.to_json())
+        print("⏱️  Time per phase:")
+        print(timer.report())
+        print(f"   (JSON: {report_path})\n")
+    
     return generated_files
 
 
@@ -0,0 +1,346 @@
+"""
+Batch output targets for rendered invitation cards
+Cards are written as they are produced, so memory doesn't grow with the batch
+"""
+
+from PIL import Image
+from collections import namedtuple
+import io
+import json
+import os
+import zipfile
+import zlib
+
+
+class CardEncoder:
+    """
+    How a rendered card is encoded: file format, compression and palette
+    
+    Cards use a handful of flat colors plus anti-aliasing, so quantizing to a
+    small palette (palette_colors) usually shrinks PNG/WebP files a lot and
+    encodes faster than full RGB.
+    
+    Args:
+        format: 'PNG', 'WEBP', 'JPEG' or 'TIFF'
+        compress_level: PNG zlib level (0-9) or WebP method (0-6);
+            None keeps Pillow's default
+        quality: JPEG / lossy WebP quality (1-100)
+        optimize: Extra optimization pass (PNG, JPEG)
+        lossless: Lossless WebP
+        palette_colors: Quantize to this many colors before encoding
+            (PNG, WebP and TIFF only)
+        dpi: Resolution stored in the file
+    """
+    
+    EXTENSIONS = {'PNG': '.png', 'WEBP': '.webp', 'JPEG': '.jpg', 'TIFF': '.tif'}
+    
+    def __init__(self, format='PNG', compress_level=None, quality=95, optimize=False,
+                 lossless=True, palette_colors=None, dpi=300):
+        self.format = format.upper()
+        if self.format == 'JPG':
+            self.format = 'JPEG'
+        if self.format not in self.EXTENSIONS:
+            raise ValueError(f"Unknown image format: {format}. Available: {list(self.EXTENSIONS.keys())}")
+        if palette_colors and self.format == 'JPEG':
+            raise ValueError("JPEG can't store a palette; use PNG, WEBP or TIFF with palette_colors")
+        
+        self.compress_level = compress_level
+        self.quality = quality
+        self.optimize = optimize
+        self.lossless = lossless
+        self.palette_colors = palette_colors
+        self.dpi = dpi
+    
+    @property
+    def extension(self):
+        """File extension matching the format"""
+        return self.EXTENSIONS[self.format]
+    
+    def save_options(self):
+        """Keyword arguments for Image.save"""
+        options = {'format': self.format, 'dpi': (self.dpi, self.dpi)}
+        if self.format == 'PNG':
+            if self.compress_level is not None:
+                options['compress_level'] = self.compress_level
+            options['optimize'] = self.optimize
+        elif self.format == 'WEBP':
+            options['lossless'] = self.lossless
+            options['quality'] = self.quality
+            if self.compress_level is not None:
+                options['method'] = self.compress_level
+        elif self.format == 'JPEG':
+            options['quality'] = self.quality
+            options['optimize'] = self.optimize
+        elif self.format == 'TIFF':
+            options['compression'] = 'tiff_deflate'
+        return options
+    
+    def prepare(self, img):
+        """Convert the image to what the encoder stores (e.g. a palette)"""
+        if self.palette_colors:
+            return img.quantize(colors=self.palette_colors, method=Image.Quantize.FASTOCTREE,
+                                dither=Image.Dither.NONE)
+        if img.mode == 'P' and self.format == 'JPEG':
+            return img.convert('RGB')  # compact cards
+        return img
+    
+    def encode(self, img):
+        """Encode an image to bytes"""
+        buffer = io.BytesIO()
+        self.prepare(img).save(buffer, **self.save_options())
+        return buffer.getvalue()
+    
+    def cache_key(self):
+        """String identifying everything that changes the encoded output"""
+        return repr(sorted(self.save_options().items()) + [('palette', self.palette_colors)])
+    
+    def describe(self):
+        """Short human-readable description"""
+        details = [f"{key}={value}" for key, value in self.save_options().items()
+                   if key not in ('format', 'dpi') and value is not False]
+        if self.palette_colors:
+            details.append(f"{self.palette_colors} colors")
+        return f"{self.format} ({', '.join(details)})" if details else self.format
+
+
+# Named encoder settings, e.g. for benchmarks and command-line use
+ENCODER_PRESETS = {
+    'png': CardEncoder('PNG'),
+    'png-fast': CardEncoder('PNG', compress_level=1),
+    'png-small': CardEncoder('PNG', compress_level=9, optimize=True),
+    'png-palette': CardEncoder('PNG', palette_colors=64),
+    'webp': CardEncoder('WEBP', lossless=True),
+    'webp-palette': CardEncoder('WEBP', lossless=True, palette_colors=64),
+    'jpeg': CardEncoder('JPEG', quality=90),
+    'tiff': CardEncoder('TIFF'),
+}
+
+
+class OutputVariant:
+    """
+    An extra, smaller file written for every card from its full-resolution render
+    
+    Encodes like a CardEncoder (encode, extension, cache_key), after
+    downsampling the card to width with a Lanczos filter.
+    
+    Args:
+        name: Added to the card's file name (Anna_invitation_A5_email.jpg)
+        width: Width in pixels; the height keeps the card's proportions
+        encoder: CardEncoder for the file (format, compression, DPI)
+    """
+    
+    def __init__(self, name, width, encoder=None):
+        if not name or not all(char.isalnum() or char in '-_' for char in name):
+            raise ValueError(f"Variant names may only use letters, digits, '-' and '_': {name!r}")
+        if width < 1:
+            raise ValueError(f"Variant width must be positive, got {width}")
+        self.name = name
+        self.width = width
+        self.encoder = encoder or CardEncoder('PNG')
+    
+    @property
+    def extension(self):
+        return self.encoder.extension
+    
+    def resize(self, img):
+        """The card at this variant's width"""
+        if img.width == self.width:
+            return img
+        if img.mode == 'P':
+            img = img.convert('RGB')  # compact cards: filter real colours, not palette indexes
+        height = max(1, round(img.height * self.width / img.width))
+        # Large reductions shrink by an integer factor first and apply
+        # Lanczos to the rest: ~4x faster for thumbnails, near-identical
+        return img.resize((self.width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    
+    def encode(self, img):
+        """Downsample and encode a full-resolution card"""
+        return self.encoder.encode(self.resize(img))
+    
+    def cache_key(self):
+        return repr((self.width, self.encoder.cache_key()))
+    
+    def describe(self):
+        return f"{self.name} ({self.width} px {self.encoder.describe()})"
+
+
+# Common extra files, for generate.py --variant NAME
+VARIANT_PRESETS = {
+    'email': OutputVariant('email', 1000, CardEncoder('JPEG', quality=90, optimize=True, dpi=96)),
+    'thumb': OutputVariant('thumb', 240, CardEncoder('PNG', dpi=72)),
+}
+
+
+# One encoded PDF page: pixel size plus the Flate-compressed RGB samples.
+# Encoding is the expensive part, so worker processes can build these and
+# hand them to the writer in the main process.
+PdfPage = namedtuple('PdfPage', ['width', 'height', 'data'])
+
+
+def encode_pdf_page(img, compress_level=6):
+    """Compress a card image into a PdfPage"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return PdfPage(img.width, img.height, zlib.compress(img.tobytes(), compress_level))
+
+
+class StreamingPdfWriter:
+    """
+    Multi-page PDF written one card at a time
+    
+    Every page is sized so its image lands at `dpi` (the card's auto-fit
+    height is kept per page). Only the page being written is held in memory;
+    the page tree and cross-reference table are written on close().
+    
+    Usage:
+        with StreamingPdfWriter('cards.pdf') as pdf:
+            for img in cards:
+                pdf.add_page(img)
+    """
+    
+    # Object 1 is the catalog and object 2 the page tree, both written last
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    
+    def __init__(self, path, dpi=300):
+        self.path = path
+        self.dpi = dpi
+        self.page_count = 0
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    
+    def _write_object(self, obj_id, body, stream=None):
+        """Write one indirect object, optionally followed by a stream"""
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode('ascii'))
+        self._file.write(body.encode('ascii'))
+        if stream is not None:
+            self._file.write(b'\nstream\n')
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+    
+    def add_page(self, img):
+        """Append a card image as a new page"""
+        self.write_page(encode_pdf_page(img))
+    
+    def write_page(self, page):
+        """Append an already encoded PdfPage"""
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+        
+        # Page size in points at the target DPI
+        width_pt = page.width * 72 / self.dpi
+        height_pt = page.height * 72 / self.dpi
+        
+        self._write_object(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/Length {len(page.data)} >>",
+            page.data
+        )
+        
+        content = f"q {width_pt:.4f} 0 0 {height_pt:.4f} 0 0 cm /Card Do Q".encode('ascii')
+        self._write_object(content_id, f"<< /Length {len(content)} >>", content)
+        
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R "
+            f"/MediaBox [0 0 {width_pt:.4f} {height_pt:.4f}] "
+            f"/Resources << /XObject << /Card {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>"
+        )
+        
+        self._page_ids.append(page_id)
+        self.page_count += 1
+    
+    def close(self):
+        """Write the page tree, catalog and cross-reference table"""
+        if self._file.closed:
+            return
+        
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(self.PAGES_ID,
+                           f"<< /Type /Pages /Kids [{kids}] /Count {self.page_count} >>")
+        self._write_object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>")
+        
+        xref_offset = self._file.tell()
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\n")
+        lines.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        self._file.write(''.join(lines).encode('ascii'))
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StreamingZipWriter:
+    """
+    ZIP archive written one card at a time from in-memory buffers
+    
+    Cards are stored as-is (ZIP_STORED): PNG, WebP and JPEG data is already
+    compressed, so deflating it again costs time for nothing. The archive is
+    built under a '.part' name and only moved into place by close(), so an
+    interrupted batch never leaves a truncated archive that looks finished.
+    
+    Usage:
+        with StreamingZipWriter('cards.zip') as archive:
+            for filename, data in cards:
+                archive.add(filename, data)
+            archive.add_json('manifest.json', manifest)
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._part_path = path + '.part'
+        self._names = set()
+        self._zip = zipfile.ZipFile(self._part_path, 'w', compression=zipfile.ZIP_STORED)
+    
+    def add(self, name, data):
+        """Store one file; returns False (and stores nothing) for a duplicate name"""
+        if name in self._names:
+            return False
+        self._names.add(name)
+        self._zip.writestr(name, data)
+        self.count += 1
+        return True
+    
+    def add_json(self, name, payload):
+        """Store a JSON document, deflated (text compresses well)"""
+        self._zip.writestr(name, json.dumps(payload, indent=1, sort_keys=True),
+                           compress_type=zipfile.ZIP_DEFLATED)
+    
+    def close(self):
+        """Finish the archive and move it into place"""
+        if self._zip.fp is None:
+            return
+        self._zip.close()
+        os.replace(self._part_path, self.path)
+    
+    def abort(self):
+        """Drop the unfinished archive"""
+        if self._zip.fp is not None:
+            self._zip.close()
+        if os.path.exists(self._part_path):
+            os.remove(self._part_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,210 @@
+"""
+Participant loaders for large guest lists
+Names are streamed row by row from CSV, JSONL or plain-text exports (or stdin),
+so a 100k-row list never has to be held in memory
+"""
+
+from contextlib import contextmanager
+import csv
+import json
+import os
+import sys
+
+
+def _clean(value):
+    """Strip a name and collapse inner runs of whitespace"""
+    return ' '.join(str(value).split()) if value is not None else ''
+
+
+@contextmanager
+def _open_source(source, encoding, newline=None):
+    """Open a path, '-' (stdin) or an already open text file"""
+    if source == '-':
+        yield sys.stdin
+    elif hasattr(source, 'read'):
+        yield source
+    else:
+        with open(source, encoding=encoding, newline=newline) as f:
+            yield f
+
+
+def _map_record(record, column):
+    """
+    Pick the participant name out of one row
+    
+    column is a field name or index, a list of them joined with spaces
+    (e.g. ['first_name', 'last_name']) or a callable(record) -> name.
+    """
+    if callable(column):
+        return _clean(column(record))
+    if isinstance(column, (list, tuple)):
+        return ' '.join(filter(None, (_clean(record[part]) for part in column)))
+    return _clean(record[column])
+
+
+def _handle_blank(blank, where):
+    """Apply the blank-row policy: 'skip' quietly or 'error'"""
+    if blank == 'error':
+        raise ValueError(f"Blank participant name at {where}")
+    if blank != 'skip':
+        raise ValueError(f"Unknown blank-row policy: {blank}. Available: ['skip', 'error']")
+
+
+def _check_columns(column, available, source):
+    """Fail early if the column mapping names a column the file doesn't have"""
+    if callable(column):
+        return
+    wanted = column if isinstance(column, (list, tuple)) else [column]
+    missing = [part for part in wanted if part not in available]
+    if missing:
+        raise ValueError(f"Column(s) {missing} not found in {source}. Available: {list(available)}")
+
+
+def read_csv(source, column='name', delimiter=',', header=True, blank='skip',
+             encoding='utf-8-sig'):
+    """
+    Stream participant names from a CSV file
+    
+    Args:
+        source: File path, '-' for stdin, or an open text file
+        column: Column holding the name: a header name, a 0-based index
+            (header=False), a list of columns joined with spaces, or a
+            callable(row) -> name
+        delimiter: Field separator (',' for CSV, '\\t' for TSV)
+        header: First row holds column names
+        blank: 'skip' rows with an empty name, or 'error' to stop on them
+        encoding: Text encoding; the default also strips an Excel BOM
+    
+    Yields:
+        Participant names in file order
+    """
+    with _open_source(source, encoding, newline='') as f:
+        if header:
+            rows = csv.DictReader(f, delimiter=delimiter)
+            _check_columns(column, rows.fieldnames or [], source)
+        else:
+            rows = csv.reader(f, delimiter=delimiter)
+        
+        for row in rows:
+            where = f"{source} line {rows.line_num}"
+            if not row:
+                _handle_blank(blank, where)
+                continue
+            try:
+                name = _map_record(row, column)
+            except IndexError:
+                raise ValueError(f"Column {column} missing at {where}") from None
+            except TypeError:
+                if callable(column) or header:
+                    raise
+                raise ValueError(f"Column {column!r} must be a 0-based index (the file has no "
+                                 f"header row), at {where}") from None
+            if not name:
+                _handle_blank(blank, where)
+                continue
+            yield name
+
+
+def read_jsonl(source, column='name', blank='skip', encoding='utf-8'):
+    """
+    Stream participant names from a JSON Lines file
+    
+    Each line is either a JSON string (the name) or an object from which
+    the name is picked with column (see read_csv).
+    
+    Yields:
+        Participant names in file order
+    """
+    with _open_source(source, encoding) as f:
+        for line_number, line in enumerate(f, 1):
+            where = f"{source} line {line_number}"
+            if not line.strip():
+                _handle_blank(blank, where)
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON at {where}: {e}") from None
+            
+            if isinstance(record, dict):
+                try:
+                    name = _map_record(record, column)
+                except KeyError as e:
+                    raise ValueError(f"Field {e} missing at {where}") from None
+            elif record is None or isinstance(record, str):
+                name = _clean(record)
+            else:
+                raise ValueError(f"Expected a name string or an object at {where}, "
+                                 f"got {type(record).__name__}")
+            if not name:
+                _handle_blank(blank, where)
+                continue
+            yield name
+
+
+def read_lines(source, blank='skip', encoding='utf-8'):
+    """
+    Stream participant names from a plain-text file, one name per line
+    
+    Yields:
+        Participant names in file order
+    """
+    with _open_source(source, encoding) as f:
+        for line_number, line in enumerate(f, 1):
+            name = _clean(line)
+            if not name:
+                _handle_blank(blank, f"{source} line {line_number}")
+                continue
+            yield name
+
+
+# File extension -> loader format
+FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.txt': 'txt',
+}
+
+
+def load_participants(source, format=None, column='name', blank='skip', **options):
+    """
+    Stream participant names from a guest list export
+    
+    Args:
+        source: File path, '-' for stdin, or an open text file
+        format: 'csv', 'tsv', 'jsonl' or 'txt'; default: from the file
+            extension ('txt' for stdin)
+        column: Column / field mapping for CSV, TSV and JSONL (see read_csv)
+        blank: 'skip' blank rows, or 'error' to stop on them
+        **options: Passed on to the loader (e.g. header, delimiter, encoding)
+    
+    Returns:
+        Lazy iterator of participant names, usable as the participants
+        argument of generate_all_invitations
+    
+    Example:
+        participants = load_participants('guests.csv', column=['first', 'last'])
+        generate_all_invitations(participants, EVENT_CONFIG, 'A5')
+    """
+    if format is None:
+        if source == '-' or hasattr(source, 'read'):
+            format = 'txt'
+        else:
+            extension = os.path.splitext(source)[1].lower()
+            if extension not in FORMATS:
+                raise ValueError(f"Can't tell the format of {source}; pass format= "
+                                 f"(one of {sorted(set(FORMATS.values()))})")
+            format = FORMATS[extension]
+    
+    format = format.lower()
+    if format == 'csv':
+        return read_csv(source, column, blank=blank, **options)
+    if format == 'tsv':
+        return read_csv(source, column, delimiter='\t', blank=blank, **options)
+    if format == 'jsonl':
+        return read_jsonl(source, column, blank=blank, **options)
+    if format == 'txt':
+        return read_lines(source, blank=blank, **options)
+    raise ValueError(f"Unknown participant format: {format}. Available: {sorted(set(FORMATS.values()))}")
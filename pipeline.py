@@ -0,0 +1,134 @@
+"""
+Staged card output: rendering, encoding and file writes overlap
+Pillow's encoders and file I/O release the GIL, so while one card is being
+compressed and written the next one is already being drawn
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import threading
+
+from timing import timed
+
+
+# Sentinel closing the writer's queue
+_DONE = object()
+
+
+def write_file(data, filepath):
+    """
+    Write encoded card bytes to filepath
+    
+    The bytes go to a temporary file that then replaces filepath, so an
+    interrupted run never leaves a truncated card behind.
+    """
+    tmp_path = filepath + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_sequential(cards, encode, timer):
+    for key, img, filepath, *card_encode in cards:
+        with timed(timer, 'encode'):
+            data = (card_encode[0] if card_encode else encode)(img)
+        with timed(timer, 'write'):
+            write_file(data, filepath)
+        yield key, filepath
+
+
+def pipelined(cards, encode, depth=8, encode_threads=2, timer=None):
+    """
+    Encode and write rendered cards while the next ones are rendered
+    
+    Three stages: the caller's thread renders (by consuming cards), a thread
+    pool encodes, and a single writer thread writes files in input order.
+    At most depth cards are in flight between rendering and their file
+    being written, which caps how many images are held in memory.
+    
+    Args:
+        cards: Iterable of (key, image, filepath) or (key, image, filepath,
+            encode) to use another encoder for that file; rendering happens
+            as it is consumed
+        encode: callable(image) -> bytes, e.g. CardEncoder.encode
+        depth: Cards in flight at once; 0 or 1 encodes and writes each card
+            before rendering the next (no threads)
+        encode_threads: Threads in the encode pool
+        timer: Optional callable(phase, seconds) for 'encode' and 'write'
+    
+    Yields:
+        (key, filepath) once the file is written, in input order
+    
+    An exception in any stage stops the pipeline: cards not yet written are
+    dropped, the threads are shut down and the exception is re-raised in
+    the caller.
+    """
+    if depth <= 1:
+        yield from _write_sequential(cards, encode, timer)
+        return
+    
+    def encode_card(img, encode):
+        with timed(timer, 'encode'):
+            return encode(img)
+    
+    to_write = queue.Queue()   # (key, encode future, filepath), in input order
+    written = queue.Queue()    # (key, filepath, error or None), in input order
+    stopped = threading.Event()
+    
+    def writer():
+        while True:
+            item = to_write.get()
+            if item is _DONE:
+                return
+            key, future, filepath = item
+            if stopped.is_set():
+                future.cancel()
+                continue  # failed or shutting down: drop the card
+            try:
+                data = future.result()
+                with timed(timer, 'write'):
+                    write_file(data, filepath)
+                written.put((key, filepath, None))
+            except BaseException as e:
+                # Nothing after the failing card reaches the disk
+                stopped.set()
+                written.put((key, filepath, e))
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, encode_threads),
+                              thread_name_prefix='card-encode')
+    writer_thread = threading.Thread(target=writer, name='card-writer', daemon=True)
+    writer_thread.start()
+    in_flight = 0
+    
+    def finished():
+        nonlocal in_flight
+        key, filepath, error = written.get()
+        in_flight -= 1
+        if error is not None:
+            raise error
+        return key, filepath
+    
+    try:
+        for key, img, filepath, *card_encode in cards:
+            future = pool.submit(encode_card, img, card_encode[0] if card_encode else encode)
+            to_write.put((key, future, filepath))
+            del img
+            in_flight += 1
+            # Hand back whatever is written; block only when the pipeline is full
+            while in_flight >= depth or (in_flight and not written.empty()):
+                yield finished()
+        while in_flight:
+            yield finished()
+    finally:
+        stopped.set()
+        to_write.put(_DONE)
+        writer_thread.join()
+        pool.shutdown(wait=True)
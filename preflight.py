@@ -0,0 +1,149 @@
+"""
+Layout-only checks of a batch before anything is rendered
+Card heights, greetings that overflow their line, characters no installed
+font can draw and an estimate of the output size
+"""
+
+from collections import Counter, namedtuple
+import unicodedata
+
+from fonts import FONT_LIBRARY, FallbackFont
+from invite import DEFAULT_ENCODER, TEXT_METRICS, TextElement
+from outputs import encode_pdf_page
+
+
+# One participant's card as laid out: height in pixels, greeting line count
+# and a list of human-readable warnings
+CardCheck = namedtuple('CardCheck', ['participant', 'height', 'greeting_lines', 'issues'])
+
+# Bytes a ZIP archive adds per member (local header, central directory entry)
+_ZIP_ENTRY_OVERHEAD = 120
+
+
+def missing_glyphs(font, text, known=None):
+    """
+    Characters of text that no face of font has a glyph for, in order
+    
+    known is an optional {character: missing} dict reused across calls
+    with the same font, so a long guest list checks each character once.
+    """
+    if isinstance(font, FallbackFont):
+        paths = font.paths
+    elif isinstance(getattr(font, 'path', None), str):
+        paths = [font.path]
+    else:
+        return []  # PIL's default bitmap font: coverage unknown
+    if known is None:
+        known = {}
+    
+    missing = []
+    for char in text:
+        absent = known.get(char)
+        if absent is None:
+            absent = known[char] = not (
+                char.isspace() or unicodedata.category(char) in ('Mn', 'Me', 'Cf')
+                or any(FONT_LIBRARY.covers(path, ord(char)) for path in paths))
+        if absent and char not in missing:
+            missing.append(char)
+    return missing
+
+
+def check_config(config, generator):
+    """
+    Warnings about the participant-independent text of a card
+    
+    Returns:
+        List of warning strings (e.g. detail lines with emoji no installed
+        font has)
+    """
+    fonts = generator._load_fonts()
+    issues = []
+    for element in generator.get_layout(config)[1].elements:
+        if isinstance(element, TextElement):
+            missing = missing_glyphs(fonts[element.font], element.text)
+            if missing:
+                issues.append(f"no installed font has {' '.join(missing)} (in {element.text!r})")
+    return issues
+
+
+def check_cards(participants, config, generator):
+    """
+    Lay out every participant's greeting without drawing anything
+    
+    Only the greeting is measured per guest; the card height for each
+    greeting line count is laid out once.
+    
+    Yields:
+        CardCheck per participant, in order
+    """
+    fonts = generator._load_fonts()
+    heading = fonts['heading']
+    max_width = generator.width - 2 * generator.padding
+    page_height = generator.PAPER_HEIGHTS.get(generator.size_name)
+    heights = {}
+    known = {}
+    
+    for participant in participants:
+        greeting = generator._greeting_text(config, participant)
+        lines = TEXT_METRICS.wrap(heading, greeting, max_width, cache=False)
+        height = heights.get(len(lines))
+        if height is None:
+            height = heights[len(lines)] = generator.get_layout(config, len(lines))[1].height
+        
+        issues = []
+        if len(lines) > 1:
+            issues.append(f"greeting wraps to {len(lines)} lines")
+            if ' '.join(lines) != greeting:
+                issues.append("name broken mid-word (a word is wider than the card)")
+        missing = missing_glyphs(heading, participant, known)
+        if missing:
+            issues.append(f"no installed font has {' '.join(missing)}")
+        if page_height and height > page_height:
+            issues.append(f"taller than a {generator.size_name} page ({height} > {page_height} px)")
+        yield CardCheck(participant, height, len(lines), issues)
+
+
+def estimate_card_bytes(config, generator, participant, output_format='png', encoder=None):
+    """
+    Bytes per pixel of one sample card in the given output format
+    
+    Renders and encodes a single card; multiply by a card's pixel count to
+    estimate its file size. SVG size barely depends on the card height, so
+    for 'svg' the whole document size is returned with per_pixel False.
+    
+    Returns:
+        (value, per_pixel)
+    """
+    if output_format == 'svg':
+        from svg import SvgRenderer
+        renderer = SvgRenderer(generator.paper_size)
+        return len(renderer.render(config, participant).encode('utf-8')), False
+    
+    img = generator.render_card(config, participant)
+    if output_format == 'pdf':
+        size = len(encode_pdf_page(img).data)
+    else:
+        size = len((encoder or DEFAULT_ENCODER).encode(img))
+        if output_format == 'zip':
+            size += _ZIP_ENTRY_OVERHEAD
+    return size / (img.width * img.height), True
+
+
+def summarize(checks):
+    """
+    Counts of a list of CardChecks
+    
+    Returns:
+        (Counter of (height, greeting lines), CardChecks with warnings)
+    """
+    heights = Counter((check.height, check.greeting_lines) for check in checks)
+    flagged = [check for check in checks if check.issues]
+    return heights, flagged
+
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
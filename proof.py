@@ -0,0 +1,297 @@
+"""
+Proof contact sheets: every card of a batch as a labelled thumbnail, 100 a page
+Cards are laid out at full size (so wrapping and heights are those of the
+print run) and replayed at thumbnail width; nothing is read back from disk
+"""
+
+from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import statistics
+
+from fonts import draw_text
+from imposition import resolve_sheet_size
+from invite import (BOLD_FONT_PATHS, FONT_REGISTRY, REGULAR_FONT_PATHS, TEXT_METRICS,
+                    InvitationCardGenerator)
+from outputs import CardEncoder, StreamingPdfWriter, encode_pdf_page
+from pipeline import write_file
+from preflight import check_cards, check_config
+from timing import timed
+
+
+PROOF_COLORS = {
+    'background': '#FFFFFF',
+    'label': '#333333',
+    'muted': '#888888',
+    'flag': '#D0021B',
+}
+
+# Contact sheets are checked on screen; fast compression matters more than size
+_PNG_ENCODER = CardEncoder('PNG', compress_level=1)
+
+
+def flag_height_outliers(checks, tolerance=0.05):
+    """
+    Add a warning to cards whose height is more than tolerance away from the median
+    
+    Returns:
+        (checks with the warnings added, median height)
+    """
+    if not checks:
+        return checks, 0
+    median = statistics.median(check.height for check in checks)
+    flagged = []
+    for check in checks:
+        deviation = (check.height - median) / median
+        if abs(deviation) > tolerance:
+            check = check._replace(issues=check.issues + [
+                f"height {check.height} px ({deviation:+.0%} vs median)"])
+        flagged.append(check)
+    return flagged, median
+
+
+def _fit(font, text, max_width):
+    """text, shortened with an ellipsis to fit max_width"""
+    # Cached per-character advances settle most labels without measuring
+    # them; they are off by a fraction of the font size at most
+    estimate = TEXT_METRICS.advance(font, text)
+    if estimate <= max_width - font.size // 2:
+        return text
+    if estimate < max_width + font.size and TEXT_METRICS.width(font, text) <= max_width:
+        return text
+    # Cut where the advances run out, then trim what kerning and overhang add
+    room = max_width - TEXT_METRICS.advance(font, '…')
+    end = 0
+    for char in text:
+        room -= TEXT_METRICS.advance(font, char)
+        if room < 0:
+            break
+        end += 1
+    text = text[:max(1, end)]
+    while len(text) > 1 and TEXT_METRICS.width(font, text + '…') > max_width:
+        text = text[:-1]
+    return text + '…'
+
+
+def _fit_header(font, title, details, max_width):
+    """'Proof: title | details', shortening the title first so details stay readable"""
+    fixed = f"Proof:  | {details}"
+    room = max_width - TEXT_METRICS.width(font, fixed)
+    if title and room > TEXT_METRICS.width(font, title[:3] + '…'):
+        return f"Proof: {_fit(font, title, room)} | {details}"
+    return _fit(font, f"Proof: {details}", max_width)
+
+
+class ProofSheet:
+    """
+    Grid geometry and thumbnail renderer for the contact sheets of one batch
+    
+    Built once in the main process, or once per worker process when sheets
+    are rendered in parallel, so fonts and templates load once.
+    """
+    
+    def __init__(self, config, paper_size='A5', per_page=100, columns=10, sheet_size='A4',
+                 tallest=1, timer=None):
+        self.config = config
+        self.per_page = per_page
+        self.columns = columns
+        self.reference = InvitationCardGenerator(paper_size, timer)
+        
+        self.width, self.height = resolve_sheet_size(sheet_size)
+        self.margin = self.width // 40
+        rows = math.ceil(per_page / columns)
+        self.cell_width = (self.width - 2 * self.margin) // columns
+        self.label_font = FONT_REGISTRY.get(REGULAR_FONT_PATHS, max(12, self.cell_width // 13))
+        self.header_font = FONT_REGISTRY.get(BOLD_FONT_PATHS, max(16, self.width // 60))
+        self.label_line = sum(TEXT_METRICS.line_metrics(self.label_font)) + 2
+        self.header_height = 2 * sum(TEXT_METRICS.line_metrics(self.header_font)) + self.margin // 2
+        self.cell_height = (self.height - 2 * self.margin - self.header_height) // rows
+        self.padding = max(4, self.cell_width // 30)
+        
+        # Thumbnail width: as wide as the cell, narrower if the tallest card
+        # wouldn't fit above its labels
+        self.box_width = self.cell_width - 2 * self.padding
+        box_height = self.cell_height - 2 * self.padding - 2 * self.label_line
+        thumb_width = min(self.box_width, box_height * self.reference.width // max(1, tallest))
+        self.thumbnails = InvitationCardGenerator(thumb_width, timer)
+    
+    def draw(self, checks, first, title, header, notes, alert=False):
+        """
+        Draw one sheet
+        
+        Args:
+            checks: CardChecks on this sheet, in order
+            first: Card number of checks[0]
+            title: Event title, shortened first when the header is too wide
+            header, notes: The rest of the first heading line, and the second
+            alert: Draw the notes in the warning colour
+        
+        Returns:
+            (sheet image, {slot: render failure message})
+        """
+        sheet = Image.new('RGB', (self.width, self.height), PROOF_COLORS['background'])
+        draw = ImageDraw.Draw(sheet)
+        margin, padding = self.margin, self.padding
+        label_font, label_line = self.label_font, self.label_line
+        draw_text(draw, (margin, margin),
+                  _fit_header(self.header_font, title, header, self.width - 2 * margin),
+                  self.header_font, PROOF_COLORS['label'])
+        draw_text(draw, (margin, margin + self.header_height // 2),
+                  _fit(label_font, notes, self.width - 2 * margin), label_font,
+                  PROOF_COLORS['flag'] if alert else PROOF_COLORS['muted'])
+        
+        failures = {}
+        for slot, check in enumerate(checks):
+            left = margin + (slot % self.columns) * self.cell_width
+            top = margin + self.header_height + (slot // self.columns) * self.cell_height
+            issues = list(check.issues)
+            try:
+                display_list = self.reference.record(self.config, check.participant)
+                thumbnail = self.thumbnails.replay(self.config, display_list)
+                sheet.paste(thumbnail, (left + padding + (self.box_width - thumbnail.width) // 2,
+                                        top + padding))
+            except Exception as e:
+                failures[slot] = f"render failed: {type(e).__name__}: {e}"
+                issues.append(failures[slot])
+            
+            # Unflagged cards only get their name: small text renders are
+            # most of a sheet's drawing time
+            label_top = top + self.cell_height - padding - 2 * label_line
+            draw_text(draw, (left + padding, label_top),
+                      _fit(label_font, f"{first + slot}. {check.participant}", self.box_width),
+                      label_font, PROOF_COLORS['label'])
+            if issues:
+                draw.rectangle([left + 1, top + 1, left + self.cell_width - 2,
+                                top + self.cell_height - 2], outline=PROOF_COLORS['flag'], width=3)
+                draw_text(draw, (left + padding, label_top + label_line),
+                          _fit(label_font, '; '.join(issues), self.box_width),
+                          label_font, PROOF_COLORS['flag'])
+        return sheet, failures
+
+
+def _encode_sheet(sheet, output_format, timer=None):
+    """A PdfPage or PNG bytes of a sheet"""
+    with timed(timer, 'encode'):
+        if output_format == 'pdf':
+            return encode_pdf_page(sheet, compress_level=1)
+        return _PNG_ENCODER.encode(sheet)
+
+
+# Parallel proofs: each worker process builds its ProofSheet once
+_worker_state = {}
+
+
+def _init_proof_worker(config, paper_size, per_page, columns, sheet_size, tallest, output_format):
+    """Initialize the per-process sheet renderer for parallel proofs"""
+    _worker_state['sheet'] = ProofSheet(config, paper_size, per_page, columns, sheet_size, tallest)
+    _worker_state['format'] = output_format
+
+
+def _render_proof_page(task):
+    """Draw and encode one sheet inside a worker process; returns (encoded, failures)"""
+    sheet, failures = _worker_state['sheet'].draw(*task)
+    return _encode_sheet(sheet, _worker_state['format']), failures
+
+
+def proof_sheets(participants, config, paper_size='A5', output_folder='output',
+                 per_page=100, columns=10, sheet_size='A4', output_format='pdf',
+                 tolerance=0.05, workers=1, timer=None):
+    """
+    Render contact sheets of labelled card thumbnails for proofing
+    
+    Every card is laid out at paper_size and replayed at thumbnail width,
+    which costs a fraction of a full-resolution render. Cards with warnings
+    (greeting wraps or breaks a word, missing glyphs, taller than the page,
+    height more than tolerance off the median) get a red frame and their
+    warning under the thumbnail.
+    
+    Args:
+        participants: Participant names (any iterable)
+        config: Configuration dictionary with event details
+        paper_size: Card width being proofed
+        output_folder: Where the sheets are written
+        per_page: Thumbnails per sheet
+        columns: Thumbnails per row
+        sheet_size: SHEET_SIZES name or (width, height) px of a sheet
+        output_format: 'pdf' for one PDF, or 'png' for one image per sheet
+        tolerance: Relative height difference from the median to flag
+        workers: Processes drawing sheets (None for one per CPU core)
+        timer: Optional callable(phase, seconds), for serial runs
+    
+    Returns:
+        (paths, flagged) - the written files and a list of
+        (participant, page number, warnings) for every flagged card
+    """
+    output_format = output_format.lower()
+    if output_format not in ('pdf', 'png'):
+        raise ValueError(f"Unknown proof format: {output_format}. Available: ['pdf', 'png']")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    participants = list(participants)
+    reference = InvitationCardGenerator(paper_size, timer)
+    checks, median = flag_height_outliers(list(check_cards(participants, config, reference)),
+                                          tolerance)
+    config_issues = check_config(config, reference)
+    tallest = max((check.height for check in checks), default=1)
+    
+    os.makedirs(output_folder, exist_ok=True)
+    size_name = reference.size_name
+    title = config['event'].get('title', '')
+    pages = max(1, math.ceil(len(checks) / per_page))
+    
+    tasks = []
+    for page in range(pages):
+        page_checks = checks[page * per_page:(page + 1) * per_page]
+        first = page * per_page + 1
+        page_flags = sum(1 for check in page_checks if check.issues)
+        header = (f"{size_name} | page {page + 1}/{pages} | "
+                  f"cards {first}-{first + len(page_checks) - 1} of {len(checks)}")
+        notes = f"median height {median:.0f} px | {page_flags} flagged on this page"
+        if config_issues:
+            notes += f" | card text: {config_issues[0]}"
+        tasks.append((page_checks, first, title, header, notes,
+                      bool(page_flags or config_issues)))
+    
+    def encoded_pages():
+        if workers <= 1 or pages == 1:
+            sheet = ProofSheet(config, paper_size, per_page, columns, sheet_size, tallest, timer)
+            for task in tasks:
+                image, failures = sheet.draw(*task)
+                yield _encode_sheet(image, output_format, timer), failures
+            return
+        with ProcessPoolExecutor(max_workers=min(workers, pages), initializer=_init_proof_worker,
+                                 initargs=(config, paper_size, per_page, columns, sheet_size,
+                                           tallest, output_format)) as pool:
+            yield from pool.map(_render_proof_page, tasks)
+    
+    flagged = []
+    paths = []
+    pdf = None
+    if output_format == 'pdf':
+        paths.append(os.path.join(output_folder, f"proof_{size_name}.pdf"))
+        pdf = StreamingPdfWriter(paths[0], dpi=300)
+    try:
+        for page, (encoded, failures) in enumerate(encoded_pages()):
+            page_checks = tasks[page][0]
+            for slot, check in enumerate(page_checks):
+                issues = check.issues + ([failures[slot]] if slot in failures else [])
+                if issues:
+                    flagged.append((check.participant, page + 1, issues))
+            
+            with timed(timer, 'write'):
+                if pdf is not None:
+                    pdf.write_page(encoded)
+                else:
+                    path = os.path.join(output_folder, f"proof_{size_name}_{page + 1:04d}.png")
+                    write_file(encoded, path)
+                    paths.append(path)
+            page_flags = sum(1 for check in page_checks if check.issues) + len(failures)
+            print(f"✓ [{page + 1}/{pages}] Proof sheet with {len(page_checks)} cards"
+                  f"{f', {page_flags} flagged' if page_flags else ''}")
+    finally:
+        if pdf is not None:
+            pdf.close()
+    
+    return paths, flagged
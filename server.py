@@ -0,0 +1,474 @@
+"""
+Local render service: a long-running asyncio server with a warm worker pool
+Fonts and card templates stay loaded between requests, so a card renders in
+milliseconds instead of paying interpreter start-up and imports every time
+
+Usage:
+    python server.py --port 8765                 # HTTP on 127.0.0.1:8765
+    python server.py --unix /tmp/invite.sock     # HTTP over a Unix socket
+    
+    POST /render   {"config": {...}, "participant": "Jane Doe",
+                    "paper_size": "A5", "format": "PNG"}  -> image bytes
+    GET  /stats    latency, queue depth and batching stats (JSON)
+    GET  /health   "ok"
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+
+from timing import percentile
+
+
+# ===== WORKER SIDE =====
+# One generator per paper size per worker process; each keeps its fonts,
+# layouts and templates between requests. Clients choose the size, so only
+# the most recently used few are kept.
+_generators = OrderedDict()
+MAX_GENERATORS = 8
+
+
+def _get_generator(paper_size):
+    from invite import InvitationCardGenerator
+    
+    generator = _generators.get(paper_size)
+    if generator is None:
+        generator = _generators[paper_size] = InvitationCardGenerator(paper_size)
+        while len(_generators) > MAX_GENERATORS:
+            _generators.popitem(last=False)
+    else:
+        _generators.move_to_end(paper_size)
+    return generator
+
+
+def _warm_worker(paper_sizes):
+    """Pool initializer: import PIL and load fonts before the first request"""
+    for paper_size in paper_sizes:
+        _get_generator(paper_size)._load_fonts()
+
+
+def _render_batch(paper_size, config, participants, image_format):
+    """
+    Render a batch of cards that share config, paper size and format
+    
+    Returns:
+        List of (image bytes or None, error or None), one per participant
+    """
+    from outputs import CardEncoder
+    
+    generator = _get_generator(paper_size)
+    encoder = CardEncoder(image_format)
+    results = []
+    for participant in participants:
+        try:
+            img = generator.render_card(config, participant)
+            results.append((encoder.encode(img), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+# ===== SERVICE =====
+class ServiceBusy(Exception):
+    """Raised when the request queue is full (backpressure)"""
+
+
+class RenderError(Exception):
+    """Raised when a card could not be rendered"""
+
+
+class _Request:
+    __slots__ = ('config', 'config_key', 'participant', 'paper_size', 'image_format',
+                 'future', 'received')
+    
+    def __init__(self, config, participant, paper_size, image_format, future):
+        self.config = config
+        self.config_key = json.dumps(config, sort_keys=True, default=str)
+        self.participant = participant
+        self.paper_size = paper_size
+        self.image_format = image_format.upper()
+        self.future = future
+        self.received = time.perf_counter()
+
+
+class RenderService:
+    """
+    Renders cards on a warm process pool, batching concurrent requests
+    
+    Requests wait in a bounded queue; render() raises ServiceBusy when it is
+    full. A batcher takes up to max_batch queued requests (waiting at most
+    batch_window seconds for more to arrive), groups them by config, paper
+    size and format, and splits each group across the workers, one task per
+    worker. At most two tasks per worker are in flight at once; while they
+    are busy the queue fills up instead.
+    
+    Usage:
+        service = RenderService(workers=4)
+        await service.start()
+        png_bytes = await service.render(config, 'Jane Doe', 'A5')
+        await service.stop()
+    """
+    
+    def __init__(self, workers=None, max_queue=1000, max_batch=32, batch_window=0.005,
+                 warm_sizes=('A5',)):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.warm_sizes = tuple(warm_sizes)
+        self.max_queue = max_queue
+        
+        self._queue = None
+        self._executor = None
+        self._batcher = None
+        self._slots = None
+        self._tasks = set()  # dispatches in flight
+        self._latencies = deque(maxlen=1000)
+        self._counts = {'requests': 0, 'rendered': 0, 'errors': 0, 'rejected': 0,
+                        'batches': 0, 'batched_cards': 0}
+        self._in_flight = 0
+        self._started = None
+    
+    async def start(self):
+        """Start the worker pool (warmed up) and the batcher"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers * 2)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                             initargs=(self.warm_sizes,))
+        
+        # Make every worker process start (and load its fonts) right away
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._executor, _warm_worker, self.warm_sizes)
+                               for _ in range(self.workers)])
+        
+        self._batcher = asyncio.create_task(self._run_batcher())
+        self._started = time.time()
+    
+    async def stop(self):
+        """Stop the batcher, fail the requests still waiting and shut the pool down"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        # Requests already on a worker finish; queued ones are failed
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            self._fail([self._queue.get_nowait()], "render service stopped")
+        if self._executor is not None:
+            # Joining the workers blocks, so keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+    
+    def _fail(self, requests, message):
+        """Resolve the still-pending futures of requests with RenderError"""
+        for request in requests:
+            if not request.future.done():
+                self._counts['errors'] += 1
+                request.future.set_exception(RenderError(message))
+    
+    async def render(self, config, participant, paper_size='A5', image_format='PNG'):
+        """
+        Render one card and return the encoded image bytes
+        
+        Raises:
+            ServiceBusy: the request queue is full
+            RenderError: the card failed to render
+        """
+        self._counts['requests'] += 1
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_Request(config, participant, paper_size, image_format, future))
+        except asyncio.QueueFull:
+            self._counts['rejected'] += 1
+            raise ServiceBusy(f"render queue is full ({self.max_queue} requests)")
+        return await future
+    
+    async def _run_batcher(self):
+        """Collect queued requests into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            dispatched = set()
+            try:
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                groups = {}
+                for request in batch:
+                    key = (request.config_key, request.paper_size, request.image_format)
+                    groups.setdefault(key, []).append(request)
+                
+                for requests in groups.values():
+                    # Spread a large group over the workers instead of one process
+                    size = -(-len(requests) // self.workers)
+                    for start in range(0, len(requests), size):
+                        # Backpressure: wait for a free worker slot before dispatching
+                        await self._slots.acquire()
+                        chunk = requests[start:start + size]
+                        task = asyncio.create_task(self._dispatch(chunk))
+                        dispatched.update(chunk)
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+            except asyncio.CancelledError:
+                # Stopping: dispatched requests still finish, the rest fail
+                self._fail([request for request in batch if request not in dispatched],
+                           "render service stopped")
+                raise
+            except Exception as e:
+                # Fail this batch, keep serving the next one
+                self._fail(batch, f"batch failed: {type(e).__name__}: {e}")
+    
+    async def _dispatch(self, requests):
+        """Render one group of requests in a worker and resolve their futures"""
+        loop = asyncio.get_running_loop()
+        first = requests[0]
+        self._in_flight += len(requests)
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _render_batch, first.paper_size, first.config,
+                [request.participant for request in requests], first.image_format
+            )
+        except Exception as e:
+            results = [(None, f"worker failed: {type(e).__name__}: {e}")] * len(requests)
+        finally:
+            self._in_flight -= len(requests)
+            self._slots.release()
+        
+        self._counts['batches'] += 1
+        self._counts['batched_cards'] += len(requests)
+        now = time.perf_counter()
+        for request, (data, error) in zip(requests, results):
+            self._latencies.append(now - request.received)
+            if request.future.done():
+                continue
+            if error is None:
+                self._counts['rendered'] += 1
+                request.future.set_result(data)
+            else:
+                self._counts['errors'] += 1
+                request.future.set_exception(RenderError(error))
+    
+    def stats(self):
+        """Counters, queue depth and latency percentiles of recent requests"""
+        latencies = sorted(self._latencies)
+        batches = self._counts['batches']
+        return {
+            **self._counts,
+            'workers': self.workers,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': self._in_flight,
+            'mean_batch_size': self._counts['batched_cards'] / batches if batches else 0.0,
+            'uptime_sec': time.time() - self._started if self._started else 0.0,
+            'latency_ms': {
+                'samples': len(latencies),
+                'p50': percentile(latencies, 0.50) * 1000,
+                'p95': percentile(latencies, 0.95) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+                'max': latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+
+# ===== HTTP FRONT END =====
+CONTENT_TYPES = {'PNG': 'image/png', 'WEBP': 'image/webp', 'JPEG': 'image/jpeg',
+                 'TIFF': 'image/tiff'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_CUSTOM_WIDTH = 10000  # px, for paper_size given as a width
+MAX_BODY_BYTES = 1 << 20  # a config and a name; anything bigger is refused
+
+
+def _paper_size(value):
+    """Validate a request's paper_size: a known size name or a width in pixels"""
+    from invite import InvitationCardGenerator
+    
+    if isinstance(value, str):
+        name = value.upper()
+        if name not in InvitationCardGenerator.PAPER_WIDTHS:
+            raise ValueError(f"Unknown paper size: {value}. "
+                             f"Available: {list(InvitationCardGenerator.PAPER_WIDTHS.keys())}")
+        return name
+    if isinstance(value, int) and not isinstance(value, bool):
+        if not 1 <= value <= MAX_CUSTOM_WIDTH:
+            raise ValueError(f"paper width must be 1-{MAX_CUSTOM_WIDTH} px, got {value}")
+        return value
+    raise ValueError(f"paper_size must be a size name or a width in pixels, "
+                     f"got {type(value).__name__}")
+
+
+async def _write_response(writer, status, body, content_type='application/json', headers=None):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+def _error(message):
+    return json.dumps({'error': message})
+
+
+async def _handle_request(service, method, path, body):
+    """Route one HTTP request; returns (status, body, content type, headers)"""
+    if method == 'GET' and path == '/health':
+        return 200, 'ok', 'text/plain', None
+    if method == 'GET' and path == '/stats':
+        return 200, json.dumps(service.stats(), indent=2), 'application/json', None
+    if method != 'POST' or path != '/render':
+        return 404, _error(f"no route for {method} {path}"), 'application/json', None
+    
+    try:
+        payload = json.loads(body)
+        config = payload['config']
+        participant = payload['participant']
+        if not isinstance(participant, str) or not participant.strip():
+            raise ValueError("participant must be a non-empty string")
+        paper_size = _paper_size(payload.get('paper_size', 'A5'))
+        image_format = payload.get('format', 'PNG')
+        if not isinstance(image_format, str):
+            raise ValueError(f"format must be a string, got {type(image_format).__name__}")
+        image_format = image_format.upper()
+        if image_format == 'JPG':
+            image_format = 'JPEG'
+        if image_format not in CONTENT_TYPES:
+            raise ValueError(f"unknown format {image_format}")
+    except (ValueError, KeyError, TypeError) as e:
+        return 400, _error(f"bad request: {e}"), 'application/json', None
+    
+    try:
+        data = await service.render(config, participant, paper_size, image_format)
+    except ServiceBusy as e:
+        return 503, _error(str(e)), 'application/json', {'Retry-After': '1'}
+    except RenderError as e:
+        return 500, _error(str(e)), 'application/json', None
+    return 200, data, CONTENT_TYPES[image_format], None
+
+
+async def _serve_connection(service, reader, writer):
+    """Minimal HTTP/1.1 connection handler with keep-alive"""
+    try:
+        while True:
+            try:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await _write_response(writer, 400, _error('malformed request line'))
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+            except (ValueError, asyncio.LimitOverrunError):
+                # A request or header line over the stream's limit (64 KiB)
+                await _write_response(writer, 400, _error('request line or header too long'))
+                break
+            
+            try:
+                length = int(headers.get('content-length', 0) or 0)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                await _write_response(writer, 400, _error('bad Content-Length'))
+                break
+            if length > MAX_BODY_BYTES:
+                await _write_response(writer, 413,
+                                      _error(f"request body over {MAX_BODY_BYTES} bytes"))
+                break
+            
+            body = await reader.readexactly(length)
+            status, response, content_type, extra = await _handle_request(
+                service, method.upper(), target.split('?', 1)[0], body
+            )
+            await _write_response(writer, status, response, content_type, extra)
+            
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8765, unix_path=None, **service_options):
+    """Run the render service until cancelled"""
+    service = RenderService(**service_options)
+    await service.start()
+    
+    def handler(reader, writer):
+        return _serve_connection(service, reader, writer)
+    
+    if unix_path:
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        where = unix_path
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        where = f"http://{host}:{port}"
+    
+    # SIGTERM stops the service as cleanly as Ctrl+C
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, AttributeError):  # Windows
+        pass
+    
+    print(f"🚀 Render service on {where} ({service.workers} warm workers)")
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        await service.stop()
+        if unix_path and os.path.exists(unix_path):
+            os.remove(unix_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Invitation card render service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU core)')
+    parser.add_argument('--max-queue', type=int, default=1000,
+                        help='queued requests before answering 503 (default: 1000)')
+    parser.add_argument('--max-batch', type=int, default=32,
+                        help='requests rendered per worker task (default: 32)')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help='how long to wait for a batch to fill (default: 5 ms)')
+    parser.add_argument('--warm', nargs='+', default=['A5'],
+                        help='paper sizes to load fonts for at start-up (default: A5)')
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, workers=args.workers,
+                          max_queue=args.max_queue, max_batch=args.max_batch,
+                          batch_window=args.batch_window_ms / 1000, warm_sizes=args.warm))
+    except KeyboardInterrupt:
+        pass
+    print("\n👋 Render service stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Sharded batch runs: split a guest list across machines (or processes) and
+check afterwards that every card was rendered exactly once
+
+    # on each of 4 machines (or as 4 local processes)
+    python generate.py --participants guests.csv --shard 0/4
+    ...
+    python generate.py --participants guests.csv --shard 3/4
+
+    # once every shard has finished (shard manifests in one folder)
+    python shards.py merge output --participants guests.csv
+"""
+
+from collections import namedtuple
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+from invite import MANIFEST_FILENAME, RENDERER_VERSION, shard_of
+
+
+# What merge_shard_manifests found
+#   files:         merged file name -> manifest entry
+#   shard_count:   N of the run
+#   missing_shards: shard indexes without a manifest
+#   duplicates:    {(participant, paper size): [shard indexes]} rendered more than once
+#   gaps:          [(participant, paper size)] never rendered
+#   misassigned:   [(participant, shard index)] rendered by a shard it doesn't belong to
+#   missing_files: file names listed in a manifest but not found in the folder
+ShardMerge = namedtuple('ShardMerge', ['files', 'shard_count', 'missing_shards', 'duplicates',
+                                       'gaps', 'misassigned', 'missing_files'])
+
+_SHARD_MANIFEST = re.compile(r'manifest\.shard-(\d+)-of-(\d+)\.json$')
+
+
+def shard_manifest_paths(folder, shard_count=None):
+    """Shard manifests in a folder (of one shard count, if given), by shard index"""
+    paths = [path for path in glob.glob(os.path.join(folder, 'manifest.shard-*-of-*.json'))
+             if _SHARD_MANIFEST.search(path)
+             and shard_count in (None, int(_SHARD_MANIFEST.search(path).group(2)))]
+    return sorted(paths, key=lambda path: int(_SHARD_MANIFEST.search(path).group(1)))
+
+
+def merge_shard_manifests(paths, participants=None, output_folder=None):
+    """
+    Combine shard manifests and check the batch was rendered exactly once
+    
+    Args:
+        paths: Shard manifest files (manifest.shard-I-of-N.json)
+        participants: The full guest list, to find participants no shard
+            rendered; without it only the participants in the manifests
+            are checked (for duplicates and missing paper sizes)
+        output_folder: Folder holding the shards' cards; the merged
+            manifest is written there as manifest.json, so later unsharded
+            runs are incremental, and every listed file must exist
+    
+    Returns:
+        ShardMerge
+    
+    Raises:
+        ValueError: The manifests come from different runs (shard count or
+            renderer version differ) or aren't shard manifests
+    """
+    files = {}
+    owners = {}  # (participant, paper size) -> shard indexes
+    misassigned = []
+    shard_count = None
+    indexes = set()
+    
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if 'shard' not in data:
+            raise ValueError(f"Not a shard manifest: {path}")
+        index, count = data['shard']
+        if shard_count is None:
+            shard_count = count
+        elif count != shard_count:
+            raise ValueError(f"{path} is shard {index} of {count}, "
+                             f"other manifests are of {shard_count} shards")
+        if data.get('renderer_version') != RENDERER_VERSION:
+            raise ValueError(f"{path} was written by renderer version "
+                             f"{data.get('renderer_version')}, not {RENDERER_VERSION}")
+        indexes.add(index)
+        
+        for filename, entry in data['files'].items():
+            participant = entry['participant']
+            owners.setdefault((participant, entry['paper_size']), []).append(index)
+            if shard_of(participant, count) != index:
+                misassigned.append((participant, index))
+            files[filename] = entry
+    
+    if shard_count is None:
+        raise ValueError("No shard manifests to merge")
+    
+    sizes = sorted({size for _, size in owners}) or ['?']
+    expected = dict.fromkeys(participants) if participants is not None else \
+        dict.fromkeys(participant for participant, _ in owners)
+    gaps = [(participant, size) for participant in expected for size in sizes
+            if (participant, size) not in owners]
+    duplicates = {key: shards for key, shards in owners.items() if len(shards) > 1}
+    
+    missing_files = []
+    if output_folder is not None:
+        missing_files = sorted(filename for filename in files
+                               if not os.path.exists(os.path.join(output_folder, filename)))
+        path = os.path.join(output_folder, MANIFEST_FILENAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'renderer_version': RENDERER_VERSION, 'files': files},
+                      f, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+    
+    return ShardMerge(files, shard_count, sorted(set(range(shard_count)) - indexes), duplicates,
+                      gaps, misassigned, missing_files)
+
+
+def _print_list(title, items, limit=20):
+    print(f"⚠️  {title}: {len(items)}")
+    for item in items[:limit]:
+        print(f"   - {item}")
+    if len(items) > limit:
+        print(f"   ... and {len(items) - limit} more")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge and check the manifests of a sharded run')
+    commands = parser.add_subparsers(dest='command', required=True)
+    merge = commands.add_parser('merge', help='combine shard manifests and list gaps')
+    merge.add_argument('folder', help='output folder holding the shard manifests and cards')
+    merge.add_argument('--participants', metavar='FILE',
+                       help='full guest list (.csv, .tsv, .jsonl, .txt) to find unrendered guests')
+    merge.add_argument('--column', default='name',
+                       help='name column(s) for CSV / JSONL lists, comma-separated (default: name)')
+    merge.add_argument('--shards', type=int, metavar='N',
+                       help='only merge manifests of an N-shard run (when older runs left others)')
+    args = parser.parse_args(argv)
+    
+    paths = shard_manifest_paths(args.folder, args.shards)
+    participants = None
+    if args.participants:
+        from participants import load_participants
+        column = args.column.split(',') if ',' in args.column else args.column
+        participants = load_participants(args.participants, column=column)
+    
+    try:
+        result = merge_shard_manifests(paths, participants, args.folder)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    print(f"\n🧩 Merged {len(paths)} shard manifest(s) of {result.shard_count}: "
+          f"{len(result.files)} card(s)")
+    if result.missing_shards:
+        _print_list("Shards without a manifest", result.missing_shards)
+    if result.gaps:
+        _print_list("Not rendered by any shard", [f"{participant} ({size})"
+                                                   for participant, size in result.gaps])
+    if result.duplicates:
+        _print_list("Rendered by more than one shard",
+                    [f"{participant} ({size}): shards {shards}"
+                     for (participant, size), shards in result.duplicates.items()])
+    if result.misassigned:
+        _print_list("Rendered by the wrong shard", [f"{participant}: shard {index}"
+                                                     for participant, index in result.misassigned])
+    if result.missing_files:
+        _print_list("Listed but missing from the folder", result.missing_files)
+    
+    complete = not (result.missing_shards or result.gaps or result.duplicates
+                    or result.misassigned or result.missing_files)
+    if complete:
+        print("✓ Every card was rendered exactly once")
+    print(f"📄 Manifest: {os.path.join(args.folder, MANIFEST_FILENAME)}\n")
+    return 0 if complete else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+SVG output: the same card layout as the PNG renderer, as vector elements
+The static document is built once per config; each guest's card is the
+template with their escaped greeting substituted in
+"""
+
+from xml.sax.saxutils import escape, quoteattr
+import re
+
+from decorations import edge_positions, hexagon_extent, hexagon_points, honeycomb_geometry
+from invite import (InvitationCardGenerator, TEXT_METRICS, TextElement, RectElement,
+                    HexagonElement, PatternElement)
+
+
+# Characters XML 1.0 can't contain at all, even escaped
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _number(value):
+    """Compact coordinate: integers without a decimal point"""
+    return str(int(value)) if float(value).is_integer() else f"{value:.2f}"
+
+
+def _points(x, y, size):
+    return ' '.join(f"{_number(px)},{_number(py)}" for px, py in hexagon_points(x, y, size))
+
+
+class SvgRenderer:
+    """
+    Renders invitation cards as SVG documents
+    
+    Layout (text wrapping, positions, auto-fit height) comes from an
+    InvitationCardGenerator, so an SVG card matches the PNG card element for
+    element. Text is set in the font families the PNG renderer loaded, with
+    generic fallbacks for viewers without them.
+    
+    Usage:
+        renderer = SvgRenderer('A5')
+        svg = renderer.render(EVENT_CONFIG, 'Jane Doe')
+    """
+    
+    def __init__(self, paper_size='A5', timer=None):
+        self.generator = InvitationCardGenerator(paper_size, timer)
+        self._templates = {}
+        self._styles = None
+    
+    def _font_styles(self):
+        """CSS class per font role, from the fonts the generator loaded"""
+        if self._styles is None:
+            rules = []
+            for role, font in self.generator._load_fonts().items():
+                try:
+                    family, style = font.getname()
+                except AttributeError:  # PIL's default bitmap font
+                    family, style = 'sans-serif', ''
+                generic = 'serif' if 'serif' in family.lower() and 'sans' not in family.lower() \
+                    else 'sans-serif'
+                weight = 'bold' if 'bold' in (style or '').lower() else 'normal'
+                # Fallback faces too: viewers pick the face per character as well
+                families = []
+                for face in getattr(font, 'faces', [font]):
+                    name = face.getname()[0] if hasattr(face, 'getname') else None
+                    if name and quoteattr(name) not in families:
+                        families.append(quoteattr(name))
+                families.append(generic)
+                rules.append(f".{role}{{font-family:{','.join(families)};"
+                             f"font-size:{font.size}px;font-weight:{weight}}}")
+            self._styles = ''.join(rules)
+        return self._styles
+    
+    def _text(self, element, colors):
+        """SVG text whose baseline matches PIL's top-left text anchor"""
+        font = self.generator._load_fonts()[element.font]
+        ascent, _ = TEXT_METRICS.line_metrics(font)
+        return (f'<text x="{_number(element.x)}" y="{_number(element.y + ascent)}" '
+                f'class="{element.font}" fill="{colors[element.color]}" '
+                f'xml:space="preserve">{escape(_INVALID_XML_CHARS.sub("", element.text))}</text>')
+    
+    def _element(self, element, colors, defs):
+        """SVG markup for one layout element"""
+        if isinstance(element, TextElement):
+            return self._text(element, colors)
+        
+        if isinstance(element, RectElement):
+            # PIL draws the outline inside the (inclusive) box; SVG centers
+            # the stroke on the rectangle edge
+            left, top, right, bottom = element.box
+            inset = element.width / 2
+            fill = colors[element.fill] if element.fill else 'none'
+            return (f'<rect x="{_number(left + inset)}" y="{_number(top + inset)}" '
+                    f'width="{_number(right - left + 1 - element.width)}" '
+                    f'height="{_number(bottom - top + 1 - element.width)}" fill="{fill}" '
+                    f'stroke="{colors[element.outline]}" stroke-width="{element.width}"/>')
+        
+        if isinstance(element, HexagonElement):
+            return (f'<polygon points="{_points(round(element.x), round(element.y), element.size)}" '
+                    f'fill="none" stroke="{colors[element.color]}" '
+                    f'stroke-width="{element.width}"/>')
+        
+        if isinstance(element, PatternElement):
+            left, top, right, bottom = element.box
+            stroke = f'fill="none" stroke="{colors[element.color]}" stroke-width="{element.width}"'
+            if element.style == 'border':
+                offset = hexagon_extent(element.size, element.width)
+                return ''.join(
+                    f'<polygon points="{_points(left + x, top + y, element.size)}" {stroke}/>'
+                    for x, y in edge_positions(right - left, bottom - top, offset, element.size)
+                )
+            
+            # Tiled background: one pattern cell, filled over the region
+            pattern_id = f"honeycomb{len(defs)}"
+            tile_width, tile_height, centers = honeycomb_geometry(element.size)
+            cells = ''.join(f'<polygon points="{_points(x, y, element.size)}" {stroke}/>'
+                            for x, y in centers)
+            defs.append(f'<pattern id="{pattern_id}" x="{left}" y="{top}" width="{tile_width}" '
+                        f'height="{tile_height}" patternUnits="userSpaceOnUse">{cells}</pattern>')
+            return (f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" '
+                    f'fill="url(#{pattern_id})"/>')
+        
+        raise TypeError(f"Unknown layout element: {type(element).__name__}")
+    
+    def _template(self, key, config, layout):
+        """
+        The static document split around the greeting: (head, tail)
+        
+        Built once per layout (config, paper width and greeting lines).
+        """
+        template = self._templates.get(key)
+        if template is None:
+            colors = config['colors']
+            width, height = self.generator.width, layout.height
+            defs = []
+            body = ''.join(self._element(element, colors, defs) for element in layout.elements)
+            head = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                    f'viewBox="0 0 {width} {height}">'
+                    f'<style>{self._font_styles()}</style>'
+                    f'<defs>{"".join(defs)}</defs>'
+                    f'<rect width="100%" height="100%" fill="{colors["background"]}"/>')
+            template = (head + body, '</svg>\n')
+            self.generator._cache_put(self._templates, key, template)
+        return template
+    
+    def render(self, config, participant_name):
+        """
+        Render one card as an SVG document string
+        
+        Only the greeting is laid out per guest; the rest of the document
+        comes from the cached template.
+        """
+        display_list = self.generator.record(config, participant_name)
+        head, tail = self._template(display_list.key, config, display_list.layout)
+        colors = config['colors']
+        greeting = ''.join(self._text(element, colors) for element in display_list.greeting)
+        return head + greeting + tail
+    
+    def card_filename(self, participant_name, clash=False):
+        """File name used for a participant's SVG card"""
+        return self.generator.card_filename(participant_name, '.svg', clash=clash)
+
+
+def iter_svg_cards(participants, config, paper_size='A5', timer=None):
+    """
+    Lazily render SVG cards
+    
+    Yields:
+        (participant, SVG document string) tuples
+    """
+    renderer = SvgRenderer(paper_size, timer)
+    for participant in participants:
+        yield participant, renderer.render(config, participant)
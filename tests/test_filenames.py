@@ -0,0 +1,31 @@
+from config import EVENT_CONFIG
+from invite import InvitationCardGenerator, case_clashes, generate_all_invitations, shard_of
+
+
+def _names(paths):
+    return sorted(path.rsplit('/', 1)[-1] for path in paths)
+
+
+def test_case_clashes_get_order_independent_file_names():
+    generator = InvitationCardGenerator('A6')
+    names = ['Anna Lee', 'Bob', 'anna lee']
+    clashes = case_clashes(names)
+    assert clashes == {'Anna Lee', 'anna lee'}
+    assert case_clashes(list(reversed(names))) == clashes
+    files = {generator.card_filename(name, clash=name in clashes) for name in names}
+    assert len({name.casefold() for name in files}) == 3
+    assert generator.card_filename('Bob') == 'Bob_invitation_A6.png'
+
+
+def test_case_clashes_are_found_across_shards(tmp_path):
+    # Two names differing in case that land in different shards
+    names = ['Anna Lee'] + [name for name in ('anna lee', 'ANNA LEE', 'anna Lee', 'Anna lee')
+                            if shard_of(name, 2) != shard_of('Anna Lee', 2)][:1]
+    assert len(names) == 2
+    written = []
+    for index in range(2):
+        written += generate_all_invitations(names, EVENT_CONFIG, 'A6', str(tmp_path),
+                                            shard=(index, 2))
+    files = _names(written)
+    assert len(files) == 2
+    assert len({name.casefold() for name in files}) == 2
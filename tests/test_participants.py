@@ -0,0 +1,24 @@
+import io
+
+import pytest
+
+from participants import load_participants, read_csv, read_jsonl
+
+
+def test_csv_without_header_needs_an_index_column():
+    with pytest.raises(ValueError, match='line 1'):
+        list(read_csv(io.StringIO('Anna Lee,x\n'), header=False))
+    assert list(read_csv(io.StringIO('Anna Lee,x\n'), column=0, header=False)) == ['Anna Lee']
+
+
+def test_jsonl_rejects_records_that_are_not_names():
+    with pytest.raises(ValueError, match='line 2'):
+        list(read_jsonl(io.StringIO('"Anna Lee"\n[1, 2]\n')))
+    with pytest.raises(ValueError, match='line 1'):
+        list(read_jsonl(io.StringIO('123\n')))
+    assert list(read_jsonl(io.StringIO('{"name": "Bob"}\n"Anna"\n'))) == ['Bob', 'Anna']
+
+
+def test_stdin_format_can_be_given(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('name\nAnna Lee\n'))
+    assert list(load_participants('-', format='csv')) == ['Anna Lee']
@@ -0,0 +1,31 @@
+import os
+import threading
+
+import pytest
+
+from pipeline import pipelined
+
+
+def test_no_card_is_written_after_a_failing_one(tmp_path):
+    release = threading.Event()
+    
+    def encode(card):
+        if card == 2:
+            raise RuntimeError("encoder failed")
+        if card > 2:
+            # Later cards are encoded before the writer reaches card 2
+            release.wait(1)
+        return b'card'
+    
+    def cards():
+        for card in range(6):
+            yield card, card, str(tmp_path / f"{card}.png")
+        release.set()
+    
+    written = []
+    with pytest.raises(RuntimeError):
+        for key, filepath in pipelined(cards(), encode, depth=8):
+            written.append(key)
+    
+    assert written == [0, 1]
+    assert sorted(os.listdir(tmp_path)) == ['0.png', '1.png']
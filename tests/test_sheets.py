@@ -0,0 +1,23 @@
+from PIL import Image, ImageChops
+
+from config import EVENT_CONFIG
+from invite import generate_all_invitations
+
+
+PARTICIPANTS = ['Alice Smith', 'Bob', 'Chen Wei']
+
+
+def _sheets(tmp_path, workers):
+    return generate_all_invitations(PARTICIPANTS, EVENT_CONFIG, 'A6', str(tmp_path / str(workers)),
+                                    sheet_size='A4', compact=True, workers=workers)
+
+
+def test_compact_sheets_keep_their_colours_on_a_worker_pool(tmp_path):
+    serial = _sheets(tmp_path, 1)
+    parallel = _sheets(tmp_path, 2)
+    assert len(serial) == len(parallel) == 1
+    with Image.open(serial[0]) as expected, Image.open(parallel[0]) as actual:
+        assert ImageChops.difference(expected.convert('RGB'),
+                                     actual.convert('RGB')).getbbox() is None
+        # Not just black and white
+        assert len(actual.convert('RGB').getcolors(1 << 16)) > 2
@@ -0,0 +1,18 @@
+from timing import RenderStats, percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 31))
+    assert percentile(values, 0.95) == 29  # rank ceil(0.95 * 30) = 29
+    assert percentile(values, 0.50) == 15
+    assert percentile(values, 1.0) == 30
+    assert percentile(values, 0.0) == 1
+    assert percentile(list(range(1, 11)), 0.90) == 9
+    assert percentile([], 0.95) == 0.0
+
+
+def test_render_stats_p95():
+    stats = RenderStats()
+    for ms in range(1, 31):
+        stats('draw', ms / 1000)
+    assert round(stats.summary()['draw']['p95_ms'], 6) == 29
@@ -0,0 +1,242 @@
+"""
+Watch mode: keep a batch's cards up to date while its config is being edited
+The config module (and its guest list file, if it has one) is polled and
+reloaded in the same process, so fonts, layouts and card templates stay
+loaded between edits and only the cards an edit affects are re-rendered
+
+    python generate.py --watch
+    python generate.py examples/wedding_config.py --participants guests.csv --watch
+"""
+
+import os
+import time
+import types
+
+from invite import (RENDER_CONFIG_KEYS, InvitationCardGenerator, generate_all_invitations,
+                    set_font_dirs)
+from participants import load_participants
+
+
+def load_config_file(path):
+    """
+    Execute a config file into a fresh module
+    
+    Bypasses the import system (sys.modules and cached bytecode), so an edit
+    saved twice within the same second is still picked up.
+    """
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    module = types.ModuleType(os.path.splitext(os.path.basename(path))[0])
+    module.__file__ = path
+    exec(compile(source, path, 'exec'), module.__dict__)
+    return module
+
+
+def config_changes(old, new):
+    """EVENT_CONFIG sections that affect rendering and differ, e.g. ['colors']"""
+    return [key for key in RENDER_CONFIG_KEYS if old.get(key) != new.get(key)]
+
+
+def participant_changes(old, new):
+    """(added, removed) participants between two guest lists, in list order"""
+    old_set, new_set = set(old), set(new)
+    return ([participant for participant in new if participant not in old_set],
+            [participant for participant in old if participant not in new_set])
+
+
+class ConfigWatcher:
+    """
+    Re-renders a config's cards whenever the config (or guest list) is saved
+    
+    Every edit goes through the incremental batch path, so a new participant
+    renders one card, a colour change renders them all and an edit that
+    doesn't reach the card (a comment, a non-rendered setting) renders
+    nothing. Generators are kept per paper size between runs; a config that
+    fails to load is reported and the previous one stays in effect.
+    
+    Usage:
+        watcher = ConfigWatcher('config.py')
+        watcher.run()  # until Ctrl+C
+    """
+    
+    def __init__(self, path, participants=None, column='name', paper_sizes=None,
+                 output_folder=None, output_format='png', encoder=None, font_dirs=(),
+                 compact=False, participants_format=None):
+        """
+        Args:
+            path: Config .py file
+            participants: Guest list file overriding PARTICIPANTS
+            column: Name column(s) for CSV / JSONL guest lists
+            paper_sizes: Paper widths overriding PAPER_SIZE
+            output_folder: Output folder overriding OUTPUT_FOLDER
+            output_format: 'png', 'pdf', 'zip' or 'svg' (PDF and ZIP output
+                is rewritten in full on every change)
+            encoder: outputs.CardEncoder for image files
+            font_dirs: Font folders searched before the config's FONT_DIRS
+            compact: Render palette images (see InvitationCardGenerator)
+            participants_format: Guest list format if its extension doesn't
+                tell (see participants.load_participants)
+        """
+        self.path = os.path.abspath(path)
+        self.participants_override = participants
+        self.column = column
+        self.paper_sizes_override = paper_sizes
+        self.output_override = output_folder
+        self.output_format = output_format
+        self.encoder = encoder
+        self.font_dirs = list(font_dirs)
+        self.compact = compact
+        self.participants_format = participants_format
+        self.state = None
+        self.generators = {}  # paper size -> InvitationCardGenerator
+        self._stamp = None
+    
+    def _participants_file(self, module):
+        source = self.participants_override or getattr(module, 'PARTICIPANTS', None)
+        return source if isinstance(source, str) else None
+    
+    def _sources(self):
+        """Files whose edits trigger a reload"""
+        sources = [self.path]
+        if self.state is not None and self.state['participants_file']:
+            sources.append(self.state['participants_file'])
+        return sources
+    
+    def _stat(self):
+        stamp = []
+        for path in self._sources():
+            try:
+                info = os.stat(path)
+                stamp.append((path, info.st_mtime_ns, info.st_size))
+            except OSError:
+                stamp.append((path, None, None))
+        return stamp
+    
+    def load(self):
+        """Read the config and guest list as they are on disk now"""
+        module = load_config_file(self.path)
+        participants_file = self._participants_file(module)
+        if participants_file:
+            column = self.column.split(',') if ',' in self.column else self.column
+            participants = list(load_participants(participants_file, self.participants_format,
+                                                  column=column))
+        else:
+            participants = list(module.PARTICIPANTS)
+        return {
+            'config': module.EVENT_CONFIG,
+            'participants': participants,
+            'participants_file': participants_file,
+            'paper_sizes': list(self.paper_sizes_override or [module.PAPER_SIZE]),
+            'output_folder': self.output_override or getattr(module, 'OUTPUT_FOLDER', 'output'),
+            'font_dirs': self.font_dirs + list(getattr(module, 'FONT_DIRS', None) or []),
+        }
+    
+    def describe(self, old, new):
+        """
+        What changed between two loaded states, as printable lines
+        
+        An empty list means no card needs re-rendering.
+        """
+        if old is None:
+            return [f"{len(new['participants'])} participant(s)"]
+        changes = []
+        sections = config_changes(old['config'], new['config'])
+        if sections:
+            changes.append(f"{', '.join(sections)} changed: every card is re-rendered")
+        added, removed = participant_changes(old['participants'], new['participants'])
+        if added:
+            changes.append(f"added: {', '.join(added[:5])}"
+                           f"{f' and {len(added) - 5} more' if len(added) > 5 else ''}")
+        if removed:
+            changes.append(f"removed: {', '.join(removed[:5])}"
+                           f"{f' and {len(removed) - 5} more' if len(removed) > 5 else ''}")
+        for key, label in (('paper_sizes', 'paper size'), ('output_folder', 'output folder'),
+                           ('font_dirs', 'font folders')):
+            if old[key] != new[key]:
+                changes.append(f"{label}: {old[key]} -> {new[key]}")
+        return changes
+    
+    def render(self, state, full=False):
+        """Bring the output folder up to date with a loaded state"""
+        if self.state is not None and state['font_dirs'] != self.state['font_dirs']:
+            # Same inputs, different glyphs: the manifest can't tell, so
+            # every card is redrawn with fresh generators
+            set_font_dirs(state['font_dirs'])
+            self.generators.clear()
+            full = True
+        
+        paper_sizes = state['paper_sizes']
+        generator = None
+        if len(paper_sizes) == 1:
+            generator = self.generators.get(paper_sizes[0])
+            if generator is None:
+                generator = self.generators[paper_sizes[0]] = \
+                    InvitationCardGenerator(paper_sizes[0], compact=self.compact)
+        
+        generate_all_invitations(
+            participants=state['participants'],
+            config=state['config'],
+            paper_size=paper_sizes[0] if len(paper_sizes) == 1 else paper_sizes,
+            output_folder=state['output_folder'],
+            incremental=not full,
+            output_format=self.output_format,
+            encoder=self.encoder,
+            generator=generator,
+            compact=self.compact,
+        )
+    
+    def poll(self, settle=0.1, full=False):
+        """
+        Reload and re-render if a watched file changed since the last poll
+        
+        Waits until the files have been unchanged for settle seconds, so an
+        editor's save is read once it is complete. full re-renders every
+        card even if its inputs are unchanged.
+        
+        Returns:
+            True if the cards were brought up to date
+        """
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        time.sleep(settle)
+        while self._stat() != stamp:
+            stamp = self._stat()
+            time.sleep(settle)
+        self._stamp = stamp
+        
+        started = time.perf_counter()
+        try:
+            state = self.load()
+        except Exception as e:
+            print(f"✗ Could not load {self.path}: {type(e).__name__}: {e}")
+            print("   (still showing the last working version)")
+            return False
+        
+        changes = self.describe(self.state, state)
+        if not changes:
+            print(f"↻ {os.path.basename(self.path)} saved, no card changes")
+            return False
+        print(f"\n🔄 {os.path.basename(self.path)}: {'; '.join(changes)}")
+        try:
+            self.render(state, full)
+        except Exception as e:
+            # The last rendered state stays, so the next save retries these changes
+            print(f"✗ Render failed: {type(e).__name__}: {e}")
+            return False
+        self.state = state
+        # The guest list file may have moved with the config
+        self._stamp = self._stat()
+        print(f"⚡ Updated in {time.perf_counter() - started:.2f} s, "
+              f"watching for changes (Ctrl+C to stop)")
+        return True
+    
+    def run(self, interval=0.25, full=False):
+        """Render once (every card if full), then poll every interval seconds until interrupted"""
+        try:
+            self.poll(full=full)
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")